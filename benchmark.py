@@ -0,0 +1,226 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from entities import Coordinate, DNA, Entity, Species
+from environment import Environment
+
+SIZES = [100, 1000, 10000, 100000]
+
+# Fraction of the population per species
+MIXES = {
+    "balanced": {Species.PLANT: 0.5, Species.HERBIVORE: 0.3, Species.OMNIVORE: 0.1, Species.CARNIVORE: 0.1},
+    "plants": {Species.PLANT: 0.8, Species.HERBIVORE: 0.15, Species.OMNIVORE: 0.05},
+    "predators": {Species.PLANT: 0.3, Species.HERBIVORE: 0.3, Species.OMNIVORE: 0.1, Species.CARNIVORE: 0.3},
+    "grazing": {Species.HERBIVORE: 0.6, Species.OMNIVORE: 0.2, Species.CARNIVORE: 0.2},
+}
+# Mixes whose plants are a vegetation field rather than entities
+VEGETATION_MIXES = {"grazing"}
+
+# The default 800x600 world holds 1000 entities at this density; larger populations get a larger world
+AREA_PER_ENTITY = 800 * 600 / 1000
+
+SEED = "benchmark"
+
+# Constructors counted by bench_allocations, the objects the object engine's tick loop builds most of
+CONSTRUCTORS = {Entity.__init__.__code__: "entities", DNA.__init__.__code__: "dna",
+                Coordinate.__init__.__code__: "coordinates"}
+
+
+def build_environment(size: int, mix: str, engine: str = "object", workers: Optional[int] = None) -> Environment:
+    scale = math.sqrt(size * AREA_PER_ENTITY / (800 * 600))
+    env = Environment(int(800 * scale), int(600 * scale), SEED, engine=engine, vegetation=mix in VEGETATION_MIXES,
+                      workers=workers)
+    for species, fraction in MIXES[mix].items():
+        env.add_random_entities(species, round(size * fraction))
+    return env
+
+
+def bench_memory(size: int, mix: str, engine: str = "object") -> Dict[str, float]:
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        env = build_environment(size, mix, engine)
+        allocated = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return {
+        "bytes": allocated,
+        "bytes_per_entity": allocated / len(env.entities),
+    }
+
+
+def bench_allocations(env: Environment, ticks: int) -> Dict[str, float]:
+    # Entities, genomes and coordinates built per tick, counted through a profile hook on their constructors,
+    # along with the net change in allocated blocks and the garbage collections per tick. The hook slows the
+    # ticks down, so these ticks are kept apart from the timed ones.
+    built = dict.fromkeys(CONSTRUCTORS.values(), 0)
+
+    def count(frame, event, arg):
+        if event == "call":
+            name = CONSTRUCTORS.get(frame.f_code)
+            if name is not None:
+                built[name] += 1
+
+    collections = sum(stats["collections"] for stats in gc.get_stats())
+    blocks = sys.getallocatedblocks()
+    sys.setprofile(count)
+    try:
+        for _ in range(ticks):
+            env.tick()
+    finally:
+        sys.setprofile(None)
+    result = {f"{name}_per_tick": value / ticks for name, value in built.items()}
+    result["blocks_per_tick"] = (sys.getallocatedblocks() - blocks) / ticks
+    result["gc_collections_per_tick"] = (sum(stats["collections"] for stats in gc.get_stats()) - collections) / ticks
+    return result
+
+
+def timed(function: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def bench_phases(env: Environment) -> Dict[str, float]:
+    # Each phase runs once over the whole population, the same work tick() does for it
+    entities = list(env.entities)
+    animals = [e for e in entities if e.species != Species.PLANT]
+    decisions = []
+    phases = {
+        "think": timed(lambda: decisions.extend(e.think(env.random) for e in entities)),
+        "move": timed(lambda: [env.move_entity(e, dx, dy, task) for e, (dx, dy, task) in zip(entities, decisions)
+                               if e.species != Species.PLANT]),
+        "eat_lookup": timed(lambda: [env.find_food(e) for e in animals]),
+        "reproduce_lookup": timed(lambda: [env.find_partner(e) for e in animals]),
+    }
+
+    # Remove and spawn one percent of the population, then put the removed entities back
+    rng = random.Random(SEED)
+    dead = rng.sample(entities, max(1, len(entities) // 100))
+    phases["removal"] = timed(lambda: env.remove_entities(dead))
+    before = len(env.entities)
+    phases["spawn"] = timed(lambda: [env.add_random_entity(Species.PLANT) for _ in dead])
+    env.remove_entities(env.entities[before:])
+    for entity in dead:
+        env.add_entity(entity)
+    return phases
+
+
+def bench_ticks(env: Environment, ticks: int) -> Dict[str, float]:
+    start_population = len(env.entities)
+    elapsed = timed(lambda: [env.tick() for _ in range(ticks)])
+    return {
+        "ticks": ticks,
+        "seconds": elapsed,
+        "ticks_per_sec": ticks / elapsed if elapsed else float("inf"),
+        "start_population": start_population,
+        "end_population": len(env.entities),
+        # Entities the object engine's tick loop still visits; the rest wait in its scheduler
+        "end_awake": len(env.awake) if env.engine is None else len(env.entities),
+    }
+
+
+def bench_render(env: Environment, frames: int, clicks: int) -> Optional[Dict[str, float]]:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    try:
+        from simulator import Simulator
+    except ImportError:
+        return None
+
+    simulator = Simulator(1100, 600)
+    simulator.env = env
+    rng = random.Random(SEED)
+    positions = [(rng.randrange(0, simulator.width - 300), rng.randrange(0, simulator.height)) for _ in range(clicks)]
+    draw = timed(lambda: [simulator.draw() for _ in range(frames)])
+    pick = timed(lambda: [simulator.handle_mouse_click(pos) for pos in positions])
+    return {
+        "draw_ms": draw / frames * 1000,
+        "pick_ms": pick / clicks * 1000,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: List[int], mixes: List[str], engine: str, ticks: int, frames: int, clicks: int,
+        render: bool, memory: bool, workers: List[Optional[int]] = (None,), allocations: bool = False) -> List[Dict]:
+    results = []
+    for mix in mixes:
+        for size in sizes:
+            for count in workers:
+                env = build_environment(size, mix, engine, count)
+                result = {"size": size, "mix": mix, "engine": engine, "width": env.width, "height": env.height}
+                if engine == "parallel":
+                    result["workers"] = len(env.engine.workers)
+                if memory:
+                    result["memory"] = bench_memory(size, mix, engine)
+                if engine == "object":
+                    result["phases"] = bench_phases(env)
+                if render:
+                    result["render"] = bench_render(env, frames, clicks)
+                result["tick"] = bench_ticks(env, ticks)
+                if allocations and engine == "object":
+                    result["allocations"] = bench_allocations(env, ticks)
+                if engine == "parallel":
+                    env.engine.close()
+                label = f"{mix:>10} {size:>7}" + (f" x{result['workers']}" if engine == "parallel" else "")
+                print(f"{label}: {result['tick']['ticks_per_sec']:10.2f} ticks/sec", file=sys.stderr)
+                results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tick, render and query scaling")
+    parser.add_argument("--sizes", type=lambda value: [int(float(s)) for s in value.split(",")], default=SIZES)
+    parser.add_argument("--mixes", type=lambda value: value.split(","), default=["balanced"])
+    parser.add_argument("--engine", choices=["object", "numpy", "parallel"], default="object")
+    parser.add_argument("--workers", type=lambda value: [int(s) for s in value.split(",")], default=[None],
+                        help="worker counts to compare with the parallel engine, e.g. 1,2,4,8,16")
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--clicks", type=int, default=50)
+    parser.add_argument("--no-render", action="store_true", help="skip the pygame draw and pick benchmarks")
+    parser.add_argument("--memory", action="store_true", help="also measure bytes allocated per entity")
+    parser.add_argument("--allocations", action="store_true",
+                        help="also count objects built and garbage collections per tick (object engine)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    for mix in args.mixes:
+        if mix not in MIXES:
+            parser.error(f"unknown mix {mix!r}, choose from {', '.join(MIXES)}")
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "results": run(args.sizes, args.mixes, args.engine, args.ticks, args.frames, args.clicks,
+                       not args.no_render, args.memory, args.workers, args.allocations),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import math
+import random
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from entities import Entity, Species, TaskType
+
+# Columns of the sensor matrix; vectors point from the entity to the nearest food or threat
+# and are zero when there is none
+SENSORS = ("energy", "health", "food_dx", "food_dy", "threat_dx", "threat_dy", "night", "temperature")
+ENERGY, HEALTH, FOOD_DX, FOOD_DY, THREAT_DX, THREAT_DY, NIGHT, TEMPERATURE = range(len(SENSORS))
+
+TASKS = list(TaskType)
+# Tasks a brain can pick, in the order of the network's task outputs
+CHOICES = (TaskType.IDLE, TaskType.MOVING, TaskType.EATING, TaskType.REPRODUCING)
+REPRODUCE = CHOICES.index(TaskType.REPRODUCING)
+
+
+class Brain:
+    # Decides for a batch of animals at once: sensors is (n, len(SENSORS)) and weights holds each
+    # entity's genome weights, (n, self.weights) or None. Returns (n, 2) directions and (n,) TaskType values.
+    name = ""
+    weights = 0  # weights every genome carries for this brain
+    senses_surroundings = False  # whether the food and threat vectors are needed; they cost a nearest search each
+
+    def decide(self, sensors: np.ndarray, weights: Optional[np.ndarray],
+               rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    def initial_weights(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        return np.empty((count, 0))
+
+    def entity_weights(self, rng: random.Random) -> array:
+        # One genome's weights drawn from the environment's stream, for the object engine
+        return array("d", self.initial_weights(1, np.random.default_rng(rng.getrandbits(64)))[0])
+
+    def decide_entities(self, env, entities: Sequence[Entity]) -> List[Tuple[float, float, TaskType]]:
+        # Object engine entry point: one (dx, dy, task) per entity, plants idle as Entity.think has them
+        decisions = [(0, 0, TaskType.IDLE)] * len(entities)
+        animals = [i for i, entity in enumerate(entities) if entity.species != Species.PLANT]
+        if not animals:
+            return decisions
+        sensors = np.zeros((len(animals), len(SENSORS)))
+        sensors[:, NIGHT] = env.night
+        sensors[:, TEMPERATURE] = env.temperature
+        for row, i in enumerate(animals):
+            entity = entities[i]
+            sensors[row, ENERGY] = entity.energy
+            sensors[row, HEALTH] = entity.health
+            if self.senses_surroundings:
+                x, y = entity.location.x, entity.location.y
+                food = env.find_food(entity)
+                if food is not None:
+                    sensors[row, FOOD_DX:FOOD_DY + 1] = food.location.x - x, food.location.y - y
+                threat = env.find_threat(entity)
+                if threat is not None:
+                    sensors[row, THREAT_DX:THREAT_DY + 1] = threat.location.x - x, threat.location.y - y
+        weights = None
+        if self.weights:
+            weights = np.array([entities[i].dna.weights for i in animals])
+        # A fresh generator per batch, seeded from the environment's stream so runs stay reproducible
+        direction, task = self.decide(sensors, weights, np.random.default_rng(env.random.getrandbits(64)))
+        for i, dx, dy, code in zip(animals, direction[:, 0].tolist(), direction[:, 1].tolist(), task.tolist()):
+            decisions[i] = (dx, dy, TASKS[code - 1])
+        return decisions
+
+
+class RandomBrain(Brain):
+    # The built-in policy of Entity.think, batched
+    name = "random"
+
+    def decide(self, sensors: np.ndarray, weights: Optional[np.ndarray],
+               rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        count = len(sensors)
+        roll = rng.random(count)
+        task = np.where(sensors[:, ENERGY] < 20, TaskType.EATING.value,
+                        np.where(sensors[:, HEALTH] < 50, TaskType.IDLE.value,
+                                 np.where(roll < 0.05, TaskType.REPRODUCING.value, TaskType.MOVING.value)))
+        direction = rng.uniform(-1, 1, (count, 2)) * (task != TaskType.IDLE.value)[:, None]
+        return direction, task
+
+
+class NetworkBrain(Brain):
+    # A small feed-forward network per entity: sensors -> tanh hidden layer -> steering and task scores.
+    # Every layer is one batched matrix multiply over all deciding entities. The task is sampled from
+    # the softmax of the scores, so a brain that always reproduces has to evolve rather than be drawn.
+    # The network steers towards or away from the food and threat it senses on top of a random walk, never
+    # in a fixed direction: a fixed heading drives whole lineages into the walls, where they pile up in
+    # contact, breed every tick and run away exponentially.
+    name = "network"
+    senses_surroundings = True
+    # Sensor readings are divided by these before they reach the network
+    SCALE = np.array([100, 100, 100, 100, 100, 100, 1, 40], np.float64)
+    # Starting task odds, roughly what the random policy does: mostly moving, reproducing one time in twenty
+    TASK_ODDS = (0.01, 0.9, 0.04, 0.05)
+
+    WANDER = 1.0  # scale of the random walk every move starts from
+    FLEE_DISTANCE = 50  # threats further away than this are ignored, and closer ones fled from harder
+
+    def __init__(self, hidden: int = 8):
+        self.hidden = hidden
+        self.shapes = [(len(SENSORS) + 1, hidden), (hidden + 1, 2 + len(CHOICES))]  # +1 for the bias row
+        self.weights = sum(rows * columns for rows, columns in self.shapes)
+        self.choices = np.array([task.value for task in CHOICES])
+
+    def initial_weights(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        layers = [rng.normal(0, 1 / math.sqrt(rows), (count, rows, columns)) for rows, columns in self.shapes]
+        layers[-1][:, -1, 2:] += np.log(self.TASK_ODDS)  # bias row of the task scores
+        return np.concatenate([layer.reshape(count, -1) for layer in layers], axis=1)
+
+    def decide(self, sensors: np.ndarray, weights: Optional[np.ndarray],
+               rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        count = len(sensors)
+        layer = np.clip(sensors / self.SCALE, -1, 1)
+        offset = 0
+        for i, (rows, columns) in enumerate(self.shapes):
+            matrices = weights[:, offset:offset + rows * columns].reshape(count, rows, columns)
+            offset += rows * columns
+            layer = np.matmul(np.concatenate([layer, np.ones((count, 1))], axis=1)[:, None, :], matrices)[:, 0]
+            if i < len(self.shapes) - 1:
+                layer = np.tanh(layer)
+        task = self.choices[self.sample(layer[:, 2:], rng)]
+        # How hard to chase food while eating and to run from the threat, each between 0 and 1
+        chase, flee = ((np.tanh(layer[:, :2]) + 1) / 2).T
+        direction = rng.uniform(-self.WANDER, self.WANDER, (count, 2))
+        for column, pull, reach in ((FOOD_DX, chase * (task == TaskType.EATING.value), math.inf),
+                                    (THREAT_DX, -flee, self.FLEE_DISTANCE)):
+            vector = sensors[:, column:column + 2]
+            length = np.hypot(vector[:, 0], vector[:, 1])
+            pull = pull * (length > 0) * np.maximum(0, 1 - length / reach)
+            direction += pull[:, None] * vector / np.where(length > 0, length, 1)[:, None]
+        direction = np.clip(direction, -1, 1) * (task != TaskType.IDLE.value)[:, None]
+        return direction, task
+
+    def sample(self, scores: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        # A draw from the softmax of the scores. Children cost their parents nothing, so a lineage that
+        # evolved to breed more often than the random policy would outgrow any world: the odds of
+        # reproducing are capped at the policy's and the excess shared out over the other tasks.
+        odds = np.exp(scores - scores.max(axis=1, keepdims=True))
+        odds /= odds.sum(axis=1, keepdims=True)
+        capped = np.minimum(odds[:, REPRODUCE], self.TASK_ODDS[REPRODUCE])
+        rest = 1 - odds[:, REPRODUCE]
+        odds *= ((1 - capped) / np.where(rest > 0, rest, 1))[:, None]
+        odds[:, REPRODUCE] = capped
+        odds[rest <= 0, 0] = 1 - capped[rest <= 0]  # nothing else to share with, so the excess idles
+        draws = (np.cumsum(odds, axis=1) < rng.random((len(scores), 1))).sum(axis=1)
+        return np.minimum(draws, len(CHOICES) - 1)
+
+
+BRAINS: Dict[str, Type[Brain]] = {brain.name: brain for brain in (RandomBrain, NetworkBrain)}
+
+
+def make_brain(name: Optional[str]) -> Optional[Brain]:
+    # None keeps Entity.think, the unbatched form of the random policy
+    if name is None:
+        return None
+    if name not in BRAINS:
+        raise ValueError(f"Unknown brain: {name}")
+    return BRAINS[name]()
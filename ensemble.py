@@ -0,0 +1,98 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from environment import Environment
+from run import SPECIES_NAMES, parse_population, populate, population_counts
+
+TRAITS = ("size", "diet", "walking_speed")
+
+
+def parse_list(text: str) -> List[str]:
+    values = []
+    for part in filter(None, text.split(",")):
+        start, dash, end = part.partition("-")
+        if dash and start.isdigit() and end.isdigit():
+            values.extend(str(value) for value in range(int(start), int(end) + 1))
+        else:
+            values.append(part)
+    return values
+
+
+def summarize(env: Environment) -> Dict:
+    # Only aggregates go back to the parent process, never the entities themselves
+    counts = population_counts(env)
+    means = {name: {trait: env.stats.mean(species, trait) for trait in TRAITS}
+             for name, species in SPECIES_NAMES.items() if counts[name]}
+    return {"population": counts, "trait_means": means}
+
+
+def run_one(config: Dict) -> Dict:
+    env = Environment(config["width"], config["height"], config["seed"], engine=config["engine"])
+    env.mutation_rate = config["mutation_rate"]
+    env.average_temperature = config["average_temperature"]
+    env.temperature = config["average_temperature"]
+    populate(env, config["population"])
+
+    start = time.perf_counter()
+    for _ in range(config["ticks"]):
+        env.tick()
+    elapsed = time.perf_counter() - start
+
+    result = {key: config[key] for key in ("seed", "mutation_rate", "average_temperature", "ticks")}
+    result["seconds"] = elapsed
+    result.update(summarize(env))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a seed x mutation rate x temperature sweep on all cores")
+    parser.add_argument("--seeds", type=parse_list, default=parse_list("0-7"), help="e.g. 0-9 or a,b,c")
+    parser.add_argument("--mutation-rates", type=lambda value: [float(v) for v in value.split(",")], default=[0.1])
+    parser.add_argument("--temperatures", type=lambda value: [float(v) for v in value.split(",")], default=[20])
+    parser.add_argument("--ticks", type=lambda value: int(float(value)), default=1000)
+    parser.add_argument("--population", type=parse_population,
+                        default=parse_population("plants=500,herbivores=200,omnivores=50,carnivores=50"))
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--engine", choices=["object", "numpy"], default="object")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", help="write the per-run summaries as JSON to this file")
+    args = parser.parse_args(argv)
+
+    configs = [{
+        "seed": seed,
+        "mutation_rate": mutation_rate,
+        "average_temperature": temperature,
+        "ticks": args.ticks,
+        "population": args.population,
+        "width": args.width,
+        "height": args.height,
+        "engine": args.engine,
+    } for seed, mutation_rate, temperature in itertools.product(args.seeds, args.mutation_rates, args.temperatures)]
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(run_one, configs):
+            results.append(result)
+            print(f"seed={result['seed']} mutation_rate={result['mutation_rate']} "
+                  f"temperature={result['average_temperature']}: "
+                  + ", ".join(f"{name}={count}" for name, count in result["population"].items()), file=sys.stderr)
+    print(f"{len(results)} runs in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
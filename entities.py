@@ -1,136 +1,268 @@
-import random
-from dataclasses import dataclass
-from enum import Enum, auto
-from typing import Dict, Tuple
-
-
-class Sex(Enum):
-    MALE = auto()
-    FEMALE = auto()
-
-
-class DamageType(Enum):
-    BLUNT = auto()
-    SHARP = auto()
-
-
-class TaskType(Enum):
-    IDLE = auto()
-    MOVING = auto()
-    EATING = auto()
-    REPRODUCING = auto()
-    ATTACKING = auto()
-
-
-class Species(Enum):
-    PLANT = auto()
-    HERBIVORE = auto()
-    OMNIVORE = auto()
-    CARNIVORE = auto()
-
-
-@dataclass
-class Coordinate:
-    x: float
-    y: float
-
-
-@dataclass
-class Locomotion:
-    walking_speed: float
-    sprinting_speed: float
-
-
-@dataclass
-class Resistance:
-    blunt_resist: float
-    sharp_resist: float
-
-
-@dataclass
-class DNA:
-    genes: Dict[str, float]
-    species: Species
-
-    @classmethod
-    def random(cls, species: Species):
-        base_genes = {
-            "size": random.uniform(0.5, 2.0),
-            "damage": random.uniform(1, 10),
-            "walking_speed": random.uniform(1, 5),
-            "sprinting_speed": random.uniform(3, 10),
-            "blunt_resist": random.uniform(0, 1),
-            "sharp_resist": random.uniform(0, 1),
-            "nocturnal": random.choice([True, False]),
-        }
-
-        if species == Species.PLANT:
-            base_genes["growth_rate"] = random.uniform(0.1, 0.5)
-        elif species == Species.HERBIVORE:
-            base_genes["diet"] = random.uniform(0, 0.3)
-        elif species == Species.OMNIVORE:
-            base_genes["diet"] = random.uniform(0.3, 0.7)
-        elif species == Species.CARNIVORE:
-            base_genes["diet"] = random.uniform(0.7, 1.0)
-
-        return cls(base_genes, species)
-
-    def mutate(self, mutation_rate: float = 0.1):
-        for gene in self.genes:
-            if random.random() < mutation_rate:
-                self.genes[gene] *= random.uniform(0.8, 1.2)
-
-
-class Entity:
-    def __init__(self, dna: DNA, location: Coordinate):
-        self.dna = dna
-        self.species = dna.species
-        self.sex = random.choice(list(Sex)) if self.species != Species.PLANT else None
-        self.health = 100
-        self.energy = 100
-        self.age = 0
-        self.damage = dna.genes.get("damage", 0)
-        self.damage_type = random.choice(list(DamageType)) if self.species != Species.PLANT else None
-        self.diet = dna.genes.get("diet", 0)
-        self.locomotion = Locomotion(dna.genes.get("walking_speed", 0), dna.genes.get("sprinting_speed", 0))
-        self.task = TaskType.IDLE
-        self.location = location
-        self.body_temp = 33
-        self.nocturnal = dna.genes["nocturnal"]
-        self.size = dna.genes["size"]
-        self.resistance = Resistance(dna.genes["blunt_resist"], dna.genes["sharp_resist"])
-        self.growth_rate = dna.genes.get("growth_rate", 0)
-
-    def reproduce(self, partner: 'Entity') -> 'Entity':
-        child_dna = DNA({
-            gene: (self.dna.genes[gene] + partner.dna.genes[gene]) / 2
-            for gene in self.dna.genes
-        }, self.species)
-        child_dna.mutate()
-        return Entity(child_dna, Coordinate(self.location.x, self.location.y))
-
-    def attack(self, enemy: 'Entity'):
-        damage = self.damage * (
-            1 - enemy.resistance.blunt_resist if self.damage_type == DamageType.BLUNT else 1 - enemy.resistance.sharp_resist)
-        enemy.health -= damage
-
-    def eat(self, food: 'Entity'):
-        if self.species == Species.PLANT:
-            self.energy += self.growth_rate * 5
-        else:
-            energy_gain = food.size * 10 * (1 - abs(self.diet - food.diet))
-            self.energy = min(100, self.energy + energy_gain)
-            food.health -= energy_gain
-
-    def think(self) -> Tuple[float, float, TaskType]:
-        if self.species == Species.PLANT:
-            return 0, 0, TaskType.IDLE
-
-        if self.energy < 20:
-            return random.uniform(-1, 1), random.uniform(-1, 1), TaskType.EATING
-        elif self.health < 50:
-            return 0, 0, TaskType.IDLE
-        elif random.random() < 0.05:  # 5% chance to attempt reproduction
-            return random.uniform(-1, 1), random.uniform(-1, 1), TaskType.REPRODUCING
-        else:
-            return random.uniform(-1, 1), random.uniform(-1, 1), TaskType.MOVING
+import random
+from array import array
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Anything with the random.Random interface. Every draw is handed its stream, so nothing reads the global one
+RNG = random.Random
+
+
+class Sex(Enum):
+    MALE = auto()
+    FEMALE = auto()
+
+
+class DamageType(Enum):
+    BLUNT = auto()
+    SHARP = auto()
+
+
+class TaskType(Enum):
+    IDLE = auto()
+    MOVING = auto()
+    EATING = auto()
+    REPRODUCING = auto()
+    ATTACKING = auto()
+
+
+class Species(Enum):
+    PLANT = auto()
+    HERBIVORE = auto()
+    OMNIVORE = auto()
+    CARNIVORE = auto()
+
+
+# For rng.choice, which draws the same from a tuple as from a list built on every call
+SEXES = tuple(Sex)
+DAMAGE_TYPES = tuple(DamageType)
+BOOLEANS = (True, False)
+
+
+@dataclass
+class Coordinate:
+    __slots__ = ("x", "y")
+    x: float
+    y: float
+
+
+@dataclass
+class Locomotion:
+    walking_speed: float
+    sprinting_speed: float
+
+
+@dataclass
+class Resistance:
+    blunt_resist: float
+    sharp_resist: float
+
+
+# Every species shares the first seven genes at fixed offsets; the last slot is species specific
+COMMON_GENES = ("size", "damage", "walking_speed", "sprinting_speed", "blunt_resist", "sharp_resist", "nocturnal")
+GENE_SCHEMA: Dict[Species, Tuple[str, ...]] = {
+    Species.PLANT: COMMON_GENES + ("growth_rate",),
+    Species.HERBIVORE: COMMON_GENES + ("diet",),
+    Species.OMNIVORE: COMMON_GENES + ("diet",),
+    Species.CARNIVORE: COMMON_GENES + ("diet",),
+}
+GENE_INDEX: Dict[Species, Dict[str, int]] = {
+    species: {gene: i for i, gene in enumerate(schema)} for species, schema in GENE_SCHEMA.items()
+}
+SIZE, DAMAGE, WALKING_SPEED, SPRINTING_SPEED, BLUNT_RESIST, SHARP_RESIST, NOCTURNAL = range(len(COMMON_GENES))
+# Random range of the species specific gene, growth_rate for plants and diet for the rest
+SPECIES_GENE_RANGE: Dict[Species, Tuple[float, float]] = {
+    Species.PLANT: (0.1, 0.5),
+    Species.HERBIVORE: (0, 0.3),
+    Species.OMNIVORE: (0.3, 0.7),
+    Species.CARNIVORE: (0.7, 1.0),
+}
+# Tables for the interaction kernels: the gene resisting each damage type, where each species keeps its
+# diet (plants have none and count as 0), and which species take a blow before they are eaten
+RESIST_SLOT: Dict[DamageType, int] = {DamageType.BLUNT: BLUNT_RESIST, DamageType.SHARP: SHARP_RESIST}
+DIET_SLOT: Dict[Species, Optional[int]] = {species: GENE_INDEX[species].get("diet") for species in Species}
+FIGHTS: Dict[Species, bool] = {species: species != Species.PLANT for species in Species}
+# Brain weights mutate additively, so they can change sign
+WEIGHT_MUTATION_SCALE = 0.2
+
+
+class DNA:
+    __slots__ = ("values", "species", "weights")
+
+    def __init__(self, values: array, species: Species, weights: Optional[array] = None):
+        self.values = values
+        self.species = species
+        self.weights = weights  # brain weights, only when the environment runs a brain that has them
+
+    @classmethod
+    def from_genes(cls, genes: Dict[str, float], species: Species) -> 'DNA':
+        return cls(array("d", (float(genes.get(gene, 0)) for gene in GENE_SCHEMA[species])), species)
+
+    @classmethod
+    def random(cls, species: Species, rng: RNG, into: Optional['DNA'] = None) -> 'DNA':
+        # Draws straight into the genome in schema order. `into` is a removed entity's genome to overwrite
+        # rather than allocating a new one.
+        if into is None or len(into.values) != len(GENE_SCHEMA[species]):
+            into = cls(array("d", [0.0] * len(GENE_SCHEMA[species])), species)
+        values = into.values
+        values[SIZE] = rng.uniform(0.5, 2.0)
+        values[DAMAGE] = rng.uniform(1, 10)
+        values[WALKING_SPEED] = rng.uniform(1, 5)
+        values[SPRINTING_SPEED] = rng.uniform(3, 10)
+        values[BLUNT_RESIST] = rng.uniform(0, 1)
+        values[SHARP_RESIST] = rng.uniform(0, 1)
+        values[NOCTURNAL] = rng.choice(BOOLEANS)
+        low, high = SPECIES_GENE_RANGE[species]
+        values[len(COMMON_GENES)] = rng.uniform(low, high)
+        into.species = species
+        into.weights = None
+        return into
+
+    @property
+    def genes(self) -> Dict[str, float]:
+        # A copy; change genes through values or gene indices
+        return dict(zip(GENE_SCHEMA[self.species], self.values))
+
+    def gene(self, name: str) -> float:
+        index = GENE_INDEX[self.species].get(name)
+        return self.values[index] if index is not None else 0
+
+    def mutate(self, mutation_rate: float, rng: RNG):
+        values = self.values
+        for i in range(len(values)):
+            if rng.random() < mutation_rate:
+                values[i] *= rng.uniform(0.8, 1.2)
+        weights = self.weights
+        if weights is not None:
+            for i in range(len(weights)):
+                if rng.random() < mutation_rate:
+                    weights[i] += rng.gauss(0, WEIGHT_MUTATION_SCALE)
+
+    def crossover(self, other: 'DNA', into: Optional['DNA'] = None) -> 'DNA':
+        # A genome is eight doubles, which a loop averages as fast as numpy would once its per-call overhead
+        # is counted, and array('d') keeps the object engine free of the numpy dependency. `into` is a
+        # removed entity's genome to overwrite rather than allocating a new one.
+        weights = None
+        if self.weights is not None and other.weights is not None:
+            weights = average(self.weights, other.weights, into.weights if into is not None else None)
+        values = average(self.values, other.values, into.values if into is not None else None)
+        if into is None:
+            return DNA(values, self.species, weights)
+        into.values, into.species, into.weights = values, self.species, weights
+        return into
+
+
+def average(a: array, b: array, into: Optional[array] = None) -> array:
+    # Element-wise mean of two arrays, written over `into` when it has the same length
+    if into is None or len(into) != len(a):
+        return array("d", [(x + y) / 2 for x, y in zip(a, b)])
+    for i in range(len(a)):
+        into[i] = (a[i] + b[i]) / 2
+    return into
+
+
+class Entity:
+    __slots__ = ("id", "dna", "species", "sex", "health", "energy", "age", "damage_type", "task", "location",
+                 "body_temp")
+
+    def __init__(self, dna: DNA, location: Coordinate, rng: RNG):
+        self.location = location
+        self.reset(dna, rng)
+
+    def reset(self, dna: DNA, rng: RNG):
+        # Everything but the location starts over, which also turns a removed entity into a new one
+        self.id: Optional[int] = None  # assigned by Environment.add_entity
+        self.dna = dna
+        self.species = dna.species
+        self.sex = rng.choice(SEXES) if self.species != Species.PLANT else None
+        self.health = 100.0
+        self.energy = 100.0
+        self.age = 0
+        self.damage_type = rng.choice(DAMAGE_TYPES) if self.species != Species.PLANT else None
+        self.task = TaskType.IDLE
+        self.body_temp = 33.0
+
+    def renew(self, dna: DNA, x: float, y: float, rng: RNG) -> 'Entity':
+        # A removed entity comes back as a new one at (x, y), keeping its objects
+        location = self.location
+        location.x = x
+        location.y = y
+        self.reset(dna, rng)
+        return self
+
+    # Gene-derived traits read straight from the genome instead of being copied onto every entity
+    size = property(lambda self: self.dna.values[SIZE])
+    damage = property(lambda self: self.dna.values[DAMAGE])
+    walking_speed = property(lambda self: self.dna.values[WALKING_SPEED])
+    sprinting_speed = property(lambda self: self.dna.values[SPRINTING_SPEED])
+    blunt_resist = property(lambda self: self.dna.values[BLUNT_RESIST])
+    sharp_resist = property(lambda self: self.dna.values[SHARP_RESIST])
+    nocturnal = property(lambda self: bool(self.dna.values[NOCTURNAL]))
+    diet = property(lambda self: self.dna.gene("diet"))
+    growth_rate = property(lambda self: self.dna.gene("growth_rate"))
+
+    @property
+    def locomotion(self) -> Locomotion:
+        return Locomotion(self.walking_speed, self.sprinting_speed)
+
+    @property
+    def resistance(self) -> Resistance:
+        return Resistance(self.blunt_resist, self.sharp_resist)
+
+    def reproduce(self, partner: 'Entity', rng: RNG, mutation_rate: float = 0.1,
+                  recycled: Optional['Entity'] = None) -> 'Entity':
+        # `recycled` is a removed entity to become the child, so no new objects are needed
+        child_dna = self.dna.crossover(partner.dna, recycled.dna if recycled is not None else None)
+        child_dna.mutate(mutation_rate, rng)
+        if recycled is not None:
+            return recycled.renew(child_dna, self.location.x, self.location.y, rng)
+        return Entity(child_dna, Coordinate(self.location.x, self.location.y), rng)
+
+    def eat(self, food: 'Entity') -> float:
+        if self.species == Species.PLANT:
+            energy_gain = self.growth_rate * 5
+            self.energy += energy_gain
+        else:
+            energy_gain = food.size * 10 * (1 - abs(self.diet - food.diet))
+            self.energy = min(100.0, self.energy + energy_gain)
+            food.health -= energy_gain
+        return energy_gain
+
+    def think(self, rng: RNG) -> Tuple[float, float, TaskType]:
+        if self.species == Species.PLANT:
+            return 0, 0, TaskType.IDLE
+
+        if self.energy < 20:
+            return rng.uniform(-1, 1), rng.uniform(-1, 1), TaskType.EATING
+        elif self.health < 50:
+            return 0, 0, TaskType.IDLE
+        elif rng.random() < 0.05:  # 5% chance to attempt reproduction
+            return rng.uniform(-1, 1), rng.uniform(-1, 1), TaskType.REPRODUCING
+        else:
+            return rng.uniform(-1, 1), rng.uniform(-1, 1), TaskType.MOVING
+
+
+def predation(contacts: Sequence[Tuple[Entity, Entity]]) -> Tuple[List[float], List[float]]:
+    # The blow and the meal of every (hunter, prey) contact in one batch. Contacts are grouped by interaction,
+    # the hunter's species and damage type and the prey's species, so the tables are read once per group and
+    # a group's contacts go through the same arithmetic, as all of them do in NumpyEngine.interact.
+    # Only animals take a blow; plants have no diet gene and count as 0.
+    groups: Dict[Tuple[Species, DamageType, Species], Tuple[List[int], List[array], List[array]]] = {}
+    for index, (hunter, food) in enumerate(contacts):
+        key = (hunter.species, hunter.damage_type, food.species)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = ([], [], [])
+        group[0].append(index)
+        group[1].append(hunter.dna.values)
+        group[2].append(food.dna.values)
+    blows = [0.0] * len(contacts)
+    meals = [0.0] * len(contacts)
+    for (species, damage_type, prey_species), (indices, hunter_genes, prey_genes) in groups.items():
+        diet, prey_diet, resist = DIET_SLOT[species], DIET_SLOT[prey_species], RESIST_SLOT[damage_type]
+        if FIGHTS[prey_species]:
+            for index, genes, food in zip(indices, hunter_genes, prey_genes):
+                blows[index] = genes[DAMAGE] * (1 - food[resist])
+        for index, genes, food in zip(indices, hunter_genes, prey_genes):
+            meals[index] = food[SIZE] * 10 * (1 - abs(genes[diet] - (food[prey_diet] if prey_diet is not None else 0)))
+    return blows, meals
@@ -1,99 +1,363 @@
-import math
-import random
-from typing import List
-
-from entities import Entity, Species, DNA, Coordinate, TaskType
-
-
-class Environment:
-    def __init__(self, width: int, height: int, seed: str = "aaaaaa"):
-        self.seed = seed
-        random.seed(seed)
-        self.width = width
-        self.height = height
-        self.average_temperature = 20
-        self.temperature = 20
-        self.time = 0
-        self.night = False
-        self.entities: List[Entity] = []
-        self.paused = False
-        self.simulation_speed = 1
-
-    def add_entity(self, entity: Entity):
-        self.entities.append(entity)
-
-    def tick(self):
-        self.time = (self.time + 1) % 10000
-        self.night = self.time >= 7500
-        self.update_temperature()
-
-        entities_to_remove = []
-
-        for entity in self.entities:
-            direction_x, direction_y, task = entity.think()
-
-            if entity.species != Species.PLANT:
-                # Move the entity
-                speed = entity.locomotion.walking_speed if task != TaskType.EATING else entity.locomotion.sprinting_speed
-                new_x = max(0, min(self.width, entity.location.x + direction_x * speed))
-                new_y = max(0, min(self.height, entity.location.y + direction_y * speed))
-                entity.location = Coordinate(new_x, new_y)
-
-            # Perform the chosen task
-            if task == TaskType.EATING:
-                potential_food = [e for e in self.entities if self.can_eat(entity, e)]
-                if potential_food:
-                    food = min(potential_food, key=lambda e: self.distance(entity, e))
-                    if self.distance(entity, food) < entity.size + food.size:
-                        entity.eat(food)
-                        if food.health <= 0:
-                            entities_to_remove.append(food)
-            elif task == TaskType.REPRODUCING:
-                partners = [e for e in self.entities if e.species == entity.species and e.sex != entity.sex]
-                if partners:
-                    partner = min(partners, key=lambda e: self.distance(entity, e))
-                    if self.distance(entity, partner) < entity.size + partner.size:
-                        child = entity.reproduce(partner)
-                        self.add_entity(child)
-
-            # Update entity state
-            entity.energy = max(0, entity.energy - 1)  # Basic energy consumption
-            entity.age += 1
-            if entity.species == Species.PLANT:
-                entity.energy += entity.growth_rate
-            if entity.health <= 0 or entity.energy <= 0 or entity.age > 1000:
-                entities_to_remove.append(entity)
-
-        # Remove entities after processing all of them
-        for entity in entities_to_remove:
-            if entity in self.entities:
-                self.entities.remove(entity)
-
-        # Spontaneous plant growth
-        if random.random() < 0.1:  # 10% chance each tick
-            self.add_entity(Entity(DNA.random(Species.PLANT),
-                                   Coordinate(random.uniform(0, self.width), random.uniform(0, self.height))))
-
-    def update_temperature(self):
-        target_temp = self.average_temperature / 2 if self.night else self.average_temperature
-        self.temperature += (target_temp - self.temperature) * 0.1
-
-    def add_random_entity(self, species: Species):
-        dna = DNA.random(species)
-        location = Coordinate(random.uniform(0, self.width), random.uniform(0, self.height))
-        self.add_entity(Entity(dna, location))
-
-    @staticmethod
-    def can_eat(predator: Entity, prey: Entity) -> bool:
-        if predator.species == Species.HERBIVORE:
-            return prey.species == Species.PLANT
-        elif predator.species == Species.CARNIVORE:
-            return prey.species in [Species.HERBIVORE, Species.OMNIVORE]
-        elif predator.species == Species.OMNIVORE:
-            return prey.species in [Species.PLANT, Species.HERBIVORE]
-        return False
-
-    @staticmethod
-    def distance(entity1: Entity, entity2: Entity) -> float:
-        return math.sqrt(
-            (entity1.location.x - entity2.location.x) ** 2 + (entity1.location.y - entity2.location.y) ** 2)
+import heapq
+import math
+import random
+from operator import attrgetter
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from entities import Entity, Species, DNA, Coordinate, TaskType, predation
+from events import EventKind, EventLog
+from profiler import Profiler
+from scheduler import Scheduler, passive
+from spatial import SpatialGrid
+from stats import PopulationStats
+
+if TYPE_CHECKING:
+    from brains import Brain  # needs numpy, which the object engine doesn't
+
+PREY = {
+    Species.HERBIVORE: (Species.PLANT,),
+    Species.CARNIVORE: (Species.HERBIVORE, Species.OMNIVORE),
+    Species.OMNIVORE: (Species.PLANT, Species.HERBIVORE),
+}
+PREDATORS = {species: tuple(predator for predator, prey in PREY.items() if species in prey) for species in Species}
+# EDIBLE[predator][prey], the species by species form of PREY
+EDIBLE = {predator: {prey: prey in PREY.get(predator, ()) for prey in Species} for predator in Species}
+SAME_SPECIES = {species: (species,) for species in Species}
+BY_ID = attrgetter("id")
+# Removed entities kept for reuse by births and spawns; past this many the rest are left to the collector
+POOL_SIZE = 4096
+
+
+class Environment:
+    def __init__(self, width: int, height: int, seed: str = "aaaaaa", engine: str = "object",
+                 brain: Optional['Brain'] = None, vegetation: bool = False, workers: Optional[int] = None):
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.width = width
+        self.height = height
+        self.average_temperature = 20
+        self.temperature = 20
+        self.time = 0
+        self.ticks = 0  # ticks since the start of the run; time wraps around every day
+        self.night = False
+        self.entities: List[Entity] = []
+        self.entities_by_id: Dict[int, Entity] = {}
+        self.positions: Dict[int, int] = {}  # entity id -> index in entities
+        # The entities the tick loop visits, in id order; the rest sleep in the scheduler
+        self.awake: List[Entity] = []
+        self.scheduler = Scheduler()
+        self.pool: List[Entity] = []  # entities the tick removed, for births and spawns to reuse
+        self.next_id = 0
+        self.grid = SpatialGrid()
+        self.stats = PopulationStats()
+        self.paused = False
+        self.simulation_speed = 1
+        self.mutation_rate = 0.1
+        self.profiler: Optional[Profiler] = None
+        self.events: Optional[EventLog] = None
+        self.brain = brain  # None keeps the per-entity Entity.think
+        # A biomass field that grazers eat from, in place of spontaneously spawning plant entities
+        self.vegetation = None
+        if vegetation:
+            from vegetation import Vegetation
+            self.vegetation = Vegetation(width, height, self.random.getrandbits(64))
+        self.engine = None
+        if engine == "numpy":
+            from numpy_engine import NumpyEngine, EngineEntities
+            self.engine = NumpyEngine(self, PREY)
+            self.entities = EngineEntities(self.engine)
+        elif engine == "parallel":
+            # Worker processes ticking strips of the world; `workers` defaults to one per core
+            from numpy_engine import EngineEntities
+            from parallel_engine import ParallelEngine
+            self.engine = ParallelEngine(self, PREY, workers)
+            self.entities = EngineEntities(self.engine)
+        elif engine != "object":
+            raise ValueError(f"Unknown engine: {engine}")
+
+    def add_entity(self, entity: Entity):
+        if self.engine is not None:
+            self.engine.add(entity)
+            return
+        if self.brain is not None and self.brain.weights and entity.dna.weights is None:
+            entity.dna.weights = self.brain.entity_weights(self.random)
+        entity.id = self.next_id
+        self.next_id += 1
+        self.entities_by_id[entity.id] = entity
+        self.positions[entity.id] = len(self.entities)
+        self.entities.append(entity)
+        self.awake.append(entity)
+        self.grid.insert(entity)
+        self.stats.add(entity.species, entity.dna.values)
+
+    def frame(self) -> Tuple[List[float], List[float], List[float], List[Species]]:
+        # Positions, sizes and species of every entity, the minimum a renderer needs
+        if self.engine is not None:
+            return self.engine.frame()
+        entities = self.entities
+        return ([e.location.x for e in entities], [e.location.y for e in entities],
+                [e.size for e in entities], [e.species for e in entities])
+
+    def get_entity(self, entity_id: int) -> Optional[Entity]:
+        if self.engine is not None:
+            row = self.engine.row_of(entity_id)
+            return self.engine.view(row) if row is not None else None
+        entity = self.entities_by_id.get(entity_id)
+        if entity is not None:
+            self.scheduler.sync(entity, self.ticks)
+        return entity
+
+    def sync(self):
+        # Bring every sleeping entity's energy and age up to date, for readers that go through the whole population
+        for entity_id in list(self.scheduler.sleeping):
+            self.scheduler.sync(self.entities_by_id[entity_id], self.ticks)
+
+    def tick(self):
+        profiler = self.profiler
+        events = self.events
+        if profiler is not None:
+            profiler.begin()
+            scanned = self.grid.scanned
+
+        self.ticks += 1
+        self.time = (self.time + 1) % 10000
+        self.night = self.time >= 7500
+        self.update_temperature()
+        if self.vegetation is not None:
+            self.vegetation.update(self.temperature, self.night)
+            if profiler is not None:
+                profiler.lap("vegetation")
+
+        if self.engine is not None:
+            self.engine.tick()
+            self.stats.tick()
+            if profiler is not None:
+                profiler.count("entities", len(self.entities))
+                profiler.end("tick")
+            return
+
+        entities_to_remove = []
+        scheduler = self.scheduler
+        woken = scheduler.due(self.ticks)
+        if woken:
+            # Ids grow with insertion, so sorting by id puts the woken back in their place in entities
+            acting = sorted((entity for entity, dies in woken if not dies), key=BY_ID)
+            entities_to_remove.extend(entity for entity, dies in woken if dies)
+            if acting:
+                self.awake = list(heapq.merge(self.awake, acting, key=BY_ID))
+        if profiler is not None:
+            profiler.lap("wake")
+
+        brain = self.brain
+        # One batch for everyone awake at the start of the tick. Newborns sit out their first tick:
+        # a deterministic brain would give them their parents' decision, and the births would chain forever.
+        decisions = brain.decide_entities(self, self.awake) if brain is not None else []
+        sleepers = False
+        contacts: List[Tuple[Entity, Entity]] = []  # (hunter, prey) catches, settled together after the loop
+
+        for index, entity in enumerate(self.awake):
+            if brain is None:
+                direction_x, direction_y, task = entity.think(self.random)
+            elif index < len(decisions):
+                direction_x, direction_y, task = decisions[index]
+            else:
+                direction_x, direction_y, task = 0, 0, TaskType.IDLE
+            if profiler is not None:
+                profiler.lap("think")
+
+            if entity.species != Species.PLANT:
+                self.move_entity(entity, direction_x, direction_y, task)
+                if profiler is not None:
+                    profiler.lap("move")
+
+            # Perform the chosen task
+            if task == TaskType.EATING:
+                grazed = self.graze(entity) if self.vegetation is not None else 0
+                if grazed:
+                    if events is not None:
+                        events.emit(self.ticks, EventKind.EAT, entity.species, entity.id, amount=grazed)
+                else:
+                    food = self.find_food(entity)
+                    if profiler is not None:
+                        profiler.lap("eat_lookup")
+                        profiler.count("food_queries")
+                    if food is not None and self.distance(entity, food) < entity.size + food.size:
+                        # The hunter finishes its step after the loop, once it has eaten
+                        contacts.append((entity, food))
+                        if profiler is not None:
+                            profiler.lap("act")
+                        continue
+            elif task == TaskType.REPRODUCING:
+                partner = self.find_partner(entity)
+                if profiler is not None:
+                    profiler.lap("reproduce_lookup")
+                    profiler.count("partner_queries")
+                if partner is not None and self.distance(entity, partner) < entity.size + partner.size:
+                    child = entity.reproduce(partner, self.random, self.mutation_rate,
+                                             self.pool.pop() if self.pool else None)
+                    self.add_entity(child)
+                    if events is not None:
+                        events.emit(self.ticks, EventKind.BIRTH, child.species, child.id, entity.id, partner.id)
+                    if profiler is not None:
+                        profiler.count("births")
+
+            if self.settle(entity, entities_to_remove):
+                sleepers = True
+            if profiler is not None:
+                profiler.lap("act")
+
+        if contacts:
+            self.prey_upon(contacts, entities_to_remove)
+            for hunter, _ in contacts:
+                if self.settle(hunter, entities_to_remove):
+                    sleepers = True
+            if profiler is not None:
+                profiler.lap("predation")
+                profiler.count("contacts", len(contacts))
+
+        if sleepers:
+            self.awake = [e for e in self.awake if e not in scheduler]
+        # Remove entities after processing all of them; sleepers eaten this tick are caught up first
+        for entity in entities_to_remove:
+            scheduler.sync(entity, self.ticks)
+        if events is not None:
+            events.deaths(self.ticks, entities_to_remove)
+        self.remove_entities(entities_to_remove, recycle=True)
+        if profiler is not None:
+            profiler.lap("removal")
+
+        # Spontaneous plant growth, which the vegetation field does instead when there is one
+        if self.vegetation is None and self.random.random() < 0.1:  # 10% chance each tick
+            plant = self.add_random_entity(Species.PLANT)
+            if events is not None:
+                events.emit(self.ticks, EventKind.SPAWN, Species.PLANT, plant.id)
+
+        self.stats.tick()
+
+        if profiler is not None:
+            profiler.lap("spawn")
+            profiler.count("deaths", len(entities_to_remove))
+            profiler.count("candidates_scanned", self.grid.scanned - scanned)
+            profiler.count("entities", len(self.entities))
+            profiler.count("awake", len(self.awake))
+            profiler.end("tick")
+
+    def settle(self, entity: Entity, entities_to_remove: List[Entity]) -> bool:
+        # The end of an entity's step: energy use, ageing and growth, then death or sleep. True if it sleeps.
+        entity.energy = max(0.0, entity.energy - 1)  # Basic energy consumption
+        entity.age += 1
+        if entity.species == Species.PLANT:
+            entity.energy += entity.growth_rate
+        if entity.health <= 0 or entity.energy <= 0 or entity.age > 1000:
+            entities_to_remove.append(entity)
+        elif passive(entity) and (self.brain is None or entity.species == Species.PLANT):
+            # A brain decides for wounded animals too, so only plants are certain to stay passive under one
+            self.scheduler.sleep(entity, self.ticks)
+            return True
+        return False
+
+    def prey_upon(self, contacts: List[Tuple[Entity, Entity]], entities_to_remove: List[Entity]):
+        # Every catch of the tick in one batch: animal prey takes the hunter's blow, then the hunter eats it
+        events = self.events
+        blows, meals = predation(contacts)
+        for (hunter, prey), blow, meal in zip(contacts, blows, meals):
+            hunter.energy = min(100.0, hunter.energy + meal)
+            prey.health -= blow + meal
+            if events is not None:
+                if blow:
+                    events.emit(self.ticks, EventKind.ATTACK, hunter.species, hunter.id, prey.id, amount=blow)
+                events.emit(self.ticks, EventKind.EAT, hunter.species, hunter.id, prey.id, amount=meal)
+            if prey.health <= 0:
+                entities_to_remove.append(prey)
+
+    def move_entity(self, entity: Entity, direction_x: float, direction_y: float, task: TaskType):
+        speed = entity.walking_speed if task != TaskType.EATING else entity.sprinting_speed
+        # In place: nothing else holds an entity's Coordinate
+        location = entity.location
+        location.x = max(0.0, min(float(self.width), location.x + direction_x * speed))
+        location.y = max(0.0, min(float(self.height), location.y + direction_y * speed))
+        self.grid.move(entity)
+
+    def graze(self, entity: Entity) -> float:
+        # Plant eaters take a bite of the cell under them, gaining what a plant their size would give
+        if not EDIBLE[entity.species][Species.PLANT]:
+            return 0
+        gain = self.vegetation.graze(entity.location.x, entity.location.y, entity.size * 10 * (1 - entity.diet))
+        entity.energy = min(100.0, entity.energy + gain)
+        return gain
+
+    def find_food(self, entity: Entity) -> Optional[Entity]:
+        return self.grid.nearest(entity.location.x, entity.location.y, PREY.get(entity.species, ()))
+
+    def find_threat(self, entity: Entity) -> Optional[Entity]:
+        return self.grid.nearest(entity.location.x, entity.location.y, PREDATORS[entity.species])
+
+    def find_partner(self, entity: Entity) -> Optional[Entity]:
+        return self.grid.nearest(entity.location.x, entity.location.y, SAME_SPECIES[entity.species],
+                                 exclude_sex=entity.sex)
+
+    def remove_entities(self, entities: List[Entity], recycle: bool = False):
+        # Dropping the id is O(1) and makes a second removal of the same entity a no-op. The last entity
+        # takes the removed one's place in entities, so a death costs the same however many are asleep;
+        # only the awake list, which the tick walks anyway, is compacted in order. With `recycle` the
+        # caller promises to hold on to none of them, so they go to the pool for reuse.
+        removed = False
+        pool = self.pool if recycle else None
+        all_entities, positions = self.entities, self.positions
+        for entity in entities:
+            if self.entities_by_id.pop(entity.id, None) is not None:
+                last = all_entities.pop()
+                position = positions.pop(entity.id)
+                if last is not entity:
+                    all_entities[position] = last
+                    positions[last.id] = position
+                self.grid.remove(entity)
+                self.stats.remove(entity.species, entity.dna.values)
+                self.scheduler.forget(entity)
+                removed = True
+                if pool is not None and len(pool) < POOL_SIZE:
+                    pool.append(entity)
+        if removed:
+            self.awake[:] = [e for e in self.awake if e.id in self.entities_by_id]
+
+    def mutate_entity(self, entity: Entity, mutation_rate: Optional[float] = None):
+        # Mutating a live entity has to go through here to keep the trait statistics in step
+        self.stats.remove(entity.species, entity.dna.values)
+        entity.dna.mutate(self.mutation_rate if mutation_rate is None else mutation_rate, self.random)
+        self.stats.add(entity.species, entity.dna.values)
+        if entity in self.scheduler:
+            # A plant's growth rate is a gene, so when it next needs a visit has to be worked out again
+            self.scheduler.sync(entity, self.ticks)
+            self.scheduler.sleep(entity, self.ticks)
+
+    def update_temperature(self):
+        target_temp = self.average_temperature / 2 if self.night else self.average_temperature
+        self.temperature += (target_temp - self.temperature) * 0.1
+
+    def add_random_entity(self, species: Species) -> Entity:
+        recycled = self.pool.pop() if self.pool else None
+        dna = DNA.random(species, self.random, recycled.dna if recycled is not None else None)
+        x, y = self.random.uniform(0, self.width), self.random.uniform(0, self.height)
+        if recycled is not None:
+            entity = recycled.renew(dna, x, y, self.random)
+        else:
+            entity = Entity(dna, Coordinate(x, y), self.random)
+        self.add_entity(entity)
+        return entity
+
+    def add_random_entities(self, species: Species, count: int):
+        # The engines draw the whole batch at once instead of one entity at a time
+        if self.engine is not None:
+            self.engine.spawn(species, count)
+            return
+        for _ in range(count):
+            self.add_random_entity(species)
+
+    @staticmethod
+    def can_eat(predator: Entity, prey: Entity) -> bool:
+        return EDIBLE[predator.species][prey.species]
+
+    @staticmethod
+    def distance(entity1: Entity, entity2: Entity) -> float:
+        return math.sqrt(
+            (entity1.location.x - entity2.location.x) ** 2 + (entity1.location.y - entity2.location.y) ** 2)
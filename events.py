@@ -0,0 +1,199 @@
+import json
+import os
+import struct
+import sys
+from array import array
+from enum import Enum, auto
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from entities import Entity, Species
+
+# File layout: a header naming the columns, then self-contained chunks of CHUNK.count rows each,
+# every column stored as one contiguous little-endian block in header order.
+# Chunks are only ever appended, so a reader stops cleanly at a chunk cut short by a crash.
+MAGIC = b"SIMPEVTS"
+VERSION = 1
+HEADER = struct.Struct("<8sII")  # magic, version, schema length
+CHUNK = struct.Struct("<4sI")  # marker, row count
+CHUNK_MARKER = b"CHNK"
+
+COLUMNS = (
+    ("tick", "q"),
+    ("kind", "b"),
+    ("cause", "b"),  # DeathCause of a death, 0 otherwise
+    ("species", "b"),
+    ("entity", "q"),  # the newborn, the one that died, ate, attacked or sprouted
+    ("other", "q"),  # parent, food or attack target, -1 when there is none
+    ("partner", "q"),  # second parent of a birth, -1 otherwise
+    ("amount", "d"),  # energy gained by eating, damage dealt by an attack, age at death
+)
+
+
+class EventKind(Enum):
+    BIRTH = auto()
+    DEATH = auto()
+    EAT = auto()
+    ATTACK = auto()
+    SPAWN = auto()
+
+
+class DeathCause(Enum):
+    HEALTH = auto()
+    ENERGY = auto()
+    AGE = auto()
+
+
+class Event(NamedTuple):
+    tick: int
+    kind: EventKind
+    cause: Optional[DeathCause]
+    species: Species
+    entity: int
+    other: int
+    partner: int
+    amount: float
+
+
+def death_cause(health: float, energy: float) -> DeathCause:
+    # Checked in the same order as the removal test in Environment.tick
+    if health <= 0:
+        return DeathCause.HEALTH
+    if energy <= 0:
+        return DeathCause.ENERGY
+    return DeathCause.AGE
+
+
+class EventLog:
+    # Events are buffered in typed arrays and written out a chunk at a time, so memory stays bounded
+    # however long the run. Emitters hold an Optional[EventLog] and skip everything when it is None.
+    # Appending to an existing log with `offset` first cuts it back to that size, dropping the chunks written
+    # after the snapshot the run resumes from, and any chunk cut short by a crash
+    def __init__(self, path: str, chunk_size: int = 1 << 16, append: bool = False, offset: Optional[int] = None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns: Dict[str, array] = {name: array(typecode) for name, typecode in COLUMNS}
+        self.written = 0
+        resume = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if resume and offset is not None:
+            if offset > os.path.getsize(path):
+                raise ValueError(f"{path} is shorter than the snapshot expects, so it can't be resumed")
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+        self.file = open(path, "ab" if resume else "wb")
+        if not resume:
+            schema = json.dumps({"columns": COLUMNS, "kinds": {kind.name: kind.value for kind in EventKind},
+                                 "causes": {cause.name: cause.value for cause in DeathCause}}).encode()
+            self.file.write(HEADER.pack(MAGIC, VERSION, len(schema)))
+            self.file.write(schema)
+
+    def __len__(self) -> int:
+        return self.written + len(self.columns["tick"])
+
+    def emit(self, tick: int, kind: EventKind, species: Species, entity: int, other: int = -1, partner: int = -1,
+             amount: float = 0.0, cause: Optional[DeathCause] = None):
+        c = self.columns
+        c["tick"].append(tick)
+        c["kind"].append(kind.value)
+        c["cause"].append(cause.value if cause is not None else 0)
+        c["species"].append(species.value)
+        c["entity"].append(entity)
+        c["other"].append(other)
+        c["partner"].append(partner)
+        c["amount"].append(amount)
+        if len(c["tick"]) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, tick: int, kind: EventKind, species: Sequence[int], entity: Sequence[int],
+               other: Optional[Sequence[int]] = None, partner: Optional[Sequence[int]] = None,
+               amount: Optional[Sequence[float]] = None, cause: Optional[Sequence[int]] = None):
+        # Batched form for the numpy engine; species and cause are raw enum values
+        count = len(entity)
+        if not count:
+            return
+        c = self.columns
+        c["tick"].extend([tick] * count)
+        c["kind"].extend([kind.value] * count)
+        c["cause"].extend(cause if cause is not None else [0] * count)
+        c["species"].extend(species)
+        c["entity"].extend(entity)
+        c["other"].extend(other if other is not None else [-1] * count)
+        c["partner"].extend(partner if partner is not None else [-1] * count)
+        c["amount"].extend(amount if amount is not None else [0.0] * count)
+        if len(c["tick"]) >= self.chunk_size:
+            self.flush()
+
+    def deaths(self, tick: int, entities: Iterable[Entity]):
+        # The removal list can name an entity twice; it only dies once
+        seen = set()
+        for entity in entities:
+            if entity.id in seen:
+                continue
+            seen.add(entity.id)
+            self.emit(tick, EventKind.DEATH, entity.species, entity.id, amount=entity.age,
+                      cause=death_cause(entity.health, entity.energy))
+
+    def flush(self):
+        count = len(self.columns["tick"])
+        if not count:
+            return
+        self.file.write(CHUNK.pack(CHUNK_MARKER, count))
+        for name, _ in COLUMNS:
+            column = self.columns[name]
+            if sys.byteorder == "big":
+                column.byteswap()
+            self.file.write(column.tobytes())
+            del column[:]
+        self.file.flush()
+        self.written += count
+
+    @property
+    def offset(self) -> int:
+        # Size of the log on disk once everything emitted so far is written out
+        self.flush()
+        return self.file.tell()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_chunks(path: str, as_numpy: bool = False) -> Iterator[Dict[str, Sequence]]:
+    # One dict of columns per chunk; only a single chunk is in memory at a time
+    with open(path, "rb") as f:
+        magic, version, length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not an event log")
+        if version > VERSION:
+            raise ValueError(f"Event log version {version} is newer than supported version {VERSION}")
+        columns: List = json.loads(f.read(length))["columns"]
+        while True:
+            head = f.read(CHUNK.size)
+            if len(head) < CHUNK.size:
+                return
+            marker, count = CHUNK.unpack(head)
+            if marker != CHUNK_MARKER:
+                raise ValueError("Corrupt event log chunk")
+            chunk = {}
+            for name, typecode in columns:
+                data = array(typecode)
+                size = data.itemsize * count
+                block = f.read(size)
+                if len(block) < size:
+                    return
+                data.frombytes(block)
+                if sys.byteorder == "big":
+                    data.byteswap()
+                chunk[name] = data
+            if as_numpy:
+                import numpy as np
+                chunk = {name: np.frombuffer(data, typecode) for (name, typecode), data in zip(columns, chunk.values())}
+            yield chunk
+
+
+def read_events(path: str) -> Iterator[Event]:
+    species = list(Species)
+    kinds = list(EventKind)
+    causes = [None] + list(DeathCause)
+    for chunk in read_chunks(path):
+        for tick, kind, cause, code, entity, other, partner, amount in zip(*chunk.values()):
+            yield Event(tick, kinds[kind - 1], causes[cause], species[code - 1], entity, other, partner, amount)
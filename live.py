@@ -0,0 +1,320 @@
+import math
+import os
+import queue
+import struct
+import threading
+import time
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from entities import Species
+
+# A running simulation publishes frames for viewers in other processes to attach to.
+# The header block, named after the run, holds the current front buffer, a sequence number bumped on
+# every publish, and the stats of both buffers. The data block holds both buffers' entity columns and is
+# replaced by a larger one (under a new name, with the generation bumped) when the population outgrows it.
+# The writer only ever fills the back buffer and then flips front, so a reader working on the front
+# buffer is never written under unless two publishes land while it is still drawing.
+MAGIC = b"SIMPLIVE"
+VERSION = 1
+# magic, version, front, sequence, generation, entity capacity and biomass cells of the data block,
+# world width and height, data block name, control address and authkey
+HEADER = struct.Struct("<8sIIQQQQdd64s128s32s")
+FRAME_FIELDS = (
+    ("tick", "Q"), ("count", "Q"), ("rate", "d"), ("target_rate", "d"), ("temperature", "d"), ("night", "?"),
+    ("paused", "?"), ("simulation_speed", "d"), ("average_temperature", "d"), ("mutation_rate", "d"),
+    ("biomass", "d"), ("rows", "I"), ("columns", "I"), ("cell_size", "d"),  # total biomass, nan without vegetation
+) + tuple((species.name, "Q") for species in Species)
+FRAME = struct.Struct("<" + "".join(code for _, code in FRAME_FIELDS))
+COLUMNS = (("x", np.float64), ("y", np.float64), ("size", np.float64), ("species", np.int8))
+ALIGN = 64
+
+# Settings a viewer may change; the spawn command covers the buttons
+SETTINGS = ("paused", "simulation_speed", "average_temperature", "mutation_rate")
+SPECIES = np.array(list(Species), dtype=object)  # indexed by Species.value - 1
+
+
+def layout(capacity: int, cells: int) -> Tuple[List[Dict[str, Tuple[np.dtype, int, int]]], int]:
+    # Per buffer, each column's dtype, length and offset into the data block
+    buffers = []
+    offset = 0
+    for _ in range(2):
+        columns = {}
+        for name, dtype in COLUMNS + (("biomass", np.float64),):
+            length = cells if name == "biomass" else capacity
+            columns[name] = (np.dtype(dtype), length, offset)
+            offset = -(-(offset + length * np.dtype(dtype).itemsize) // ALIGN) * ALIGN
+        buffers.append(columns)
+    return buffers, max(offset, 1)
+
+
+def views(memory: SharedMemory, buffers) -> List[Dict[str, np.ndarray]]:
+    return [{name: np.ndarray(length, dtype, memory.buf, offset) for name, (dtype, length, offset) in columns.items()}
+            for columns in buffers]
+
+
+def attach(name: str) -> SharedMemory:
+    # The viewer is no child of the simulation, so before Python 3.13 its resource tracker would unlink
+    # blocks it merely attached to as soon as it exited
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = SharedMemory(name=name)
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+
+def frame_columns(env) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    if env.engine is not None:
+        from numpy_engine import GENE_INDEX
+        c = env.engine.columns
+        return c["x"], c["y"], env.engine.genes[:, GENE_INDEX["size"]], c["species"]
+    xs, ys, sizes, species = env.frame()
+    return (np.array(xs, np.float64), np.array(ys, np.float64), np.array(sizes, np.float64),
+            np.array([kind.value for kind in species], np.int8))
+
+
+def apply(env, command: Tuple):
+    # Commands come from viewers, so anything unexpected is dropped rather than trusted
+    if command[0] == "set" and command[1] in SETTINGS:
+        setattr(env, command[1], bool(command[2]) if command[1] == "paused" else float(command[2]))
+    elif command[0] == "spawn" and command[1] in Species.__members__:
+        for _ in range(max(0, min(int(command[2]), 1000))):
+            env.add_random_entity(Species[command[1]])
+
+
+class LivePublisher:
+    # The simulation side: call update(env) between ticks. Control commands from viewers are applied
+    # there, on the simulation's own thread, and frames are only published while a viewer is attached.
+    def __init__(self, name: str, fps: float = 30):
+        self.name = name
+        self.interval = 1 / fps
+        self.header = self.create(name, HEADER.size + 2 * FRAME.size)
+        self.data: Optional[SharedMemory] = None
+        self.buffers: List[Dict[str, np.ndarray]] = []
+        self.capacity = 0
+        self.cells = 0
+        self.generation = 0
+        self.front = 0
+        self.sequence = 0
+        self.last_time = 0.0
+        self.last_tick = 0
+        self.authkey = os.urandom(16).hex().encode()
+        self.listener = Listener(authkey=self.authkey)
+        self.commands: "queue.SimpleQueue[Tuple]" = queue.SimpleQueue()
+        self.connections: List = []
+        self.lock = threading.Lock()
+        self.closed = False
+        self.write_header(0, 0)
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    @staticmethod
+    def create(name: str, size: int) -> SharedMemory:
+        try:
+            return SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a run that was killed; nothing can still be writing to it
+            stale = SharedMemory(name=name)
+            stale.unlink()
+            stale.close()
+            return SharedMemory(name=name, create=True, size=size)
+
+    def accept(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self.closed:
+                    return
+                continue
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection):
+        with self.lock:
+            self.connections.append(connection)
+        try:
+            while True:
+                self.commands.put(connection.recv())
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self.lock:
+                self.connections.remove(connection)
+            connection.close()
+
+    @property
+    def viewers(self) -> int:
+        return len(self.connections)
+
+    def update(self, env, target_rate: float = 0.0, force: bool = False):
+        # target_rate is the ticks per second the caller is pacing the run to, 0 when it runs flat out
+        while True:
+            try:
+                apply(env, self.commands.get_nowait())
+            except queue.Empty:
+                break
+        now = time.perf_counter()
+        if self.viewers and (force or now - self.last_time >= self.interval):
+            self.publish(env, now, target_rate)
+
+    def publish(self, env, now: float, target_rate: float):
+        xs, ys, sizes, species = frame_columns(env)
+        count = len(xs)
+        vegetation = env.vegetation
+        cells = vegetation.biomass.size if vegetation is not None else 0
+        if count > self.capacity or cells != self.cells:
+            self.resize(max(count, 2 * self.capacity, 1024), cells, env)
+
+        back = 1 - self.front
+        columns = self.buffers[back]
+        columns["x"][:count] = xs
+        columns["y"][:count] = ys
+        columns["size"][:count] = sizes
+        columns["species"][:count] = species
+        if cells:
+            columns["biomass"][:] = vegetation.biomass.reshape(-1)
+
+        elapsed = now - self.last_time
+        rate = (env.ticks - self.last_tick) / elapsed if self.last_time and elapsed > 0 else 0.0
+        self.last_time, self.last_tick = now, env.ticks
+        values = {
+            "tick": env.ticks, "count": count, "rate": rate, "target_rate": target_rate,
+            "temperature": env.temperature, "night": env.night, "paused": env.paused,
+            "simulation_speed": env.simulation_speed, "average_temperature": env.average_temperature,
+            "mutation_rate": env.mutation_rate, "biomass": vegetation.total() if vegetation is not None else math.nan,
+            "rows": vegetation.rows if vegetation is not None else 0,
+            "columns": vegetation.columns if vegetation is not None else 0,
+            "cell_size": vegetation.cell_size if vegetation is not None else 0,
+        }
+        values.update((species.name, env.stats.count(species)) for species in Species)
+        FRAME.pack_into(self.header.buf, HEADER.size + back * FRAME.size, *(values[name] for name, _ in FRAME_FIELDS))
+        self.write_header(back, self.sequence + 1, env)
+
+    def resize(self, capacity: int, cells: int, env):
+        buffers, size = layout(capacity, cells)
+        self.generation += 1
+        data = self.create(f"{self.name}-{self.generation}", size)
+        old, self.buffers = self.buffers, views(data, buffers)
+        if old:
+            # The header is about to point readers at the new block under the current sequence, so it has to
+            # hold the frame they would have read from the old one
+            front, previous = self.buffers[self.front], old[self.front]
+            for name in previous:
+                if name != "biomass" or len(previous[name]) == len(front[name]):
+                    front[name][:len(previous[name])] = previous[name]
+            del front, previous
+        del old  # the old block can only be closed once no views into it are left
+        if self.data is not None:
+            # Viewers still mapping the old block keep it alive until they move over
+            self.data.close()
+            self.data.unlink()
+        self.data = data
+        self.capacity, self.cells = capacity, cells
+        self.write_header(self.front, self.sequence, env)
+
+    def write_header(self, front: int, sequence: int, env=None):
+        self.front, self.sequence = front, sequence
+        HEADER.pack_into(self.header.buf, 0, MAGIC, VERSION, front, sequence, self.generation, self.capacity,
+                         self.cells, env.width if env is not None else 0, env.height if env is not None else 0,
+                         self.data.name.encode() if self.data is not None else b"",
+                         str(self.listener.address).encode(), self.authkey)
+
+    def close(self):
+        # Closing the connections is what tells attached viewers the run is over
+        self.closed = True
+        self.listener.close()
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+        self.buffers = []
+        for memory in (self.data, self.header):
+            if memory is not None:
+                memory.close()
+                memory.unlink()
+        self.data = None
+
+
+class LiveView:
+    # The viewer side: maps the published buffers and reads them in place
+    def __init__(self, name: str):
+        self.header = attach(name)
+        magic, version, *_, address, authkey = HEADER.unpack_from(self.header.buf)
+        if magic != MAGIC:
+            raise ValueError(f"{name} is not a live simulation")
+        if version > VERSION:
+            raise ValueError(f"Live view version {version} is newer than supported version {VERSION}")
+        self.connection = Client(address.rstrip(b"\0").decode(), authkey=authkey.rstrip(b"\0"))
+        self.data: Optional[SharedMemory] = None
+        self.buffers: List[Dict[str, np.ndarray]] = []
+        self.generation = 0
+        self.closed = False
+
+    def read(self) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+        # The newest frame's stats and its columns, as views into shared memory; None before the first frame
+        for _ in range(10):
+            _, _, front, sequence, generation, capacity, cells, width, height, data_name, *_ = \
+                HEADER.unpack_from(self.header.buf)
+            if not sequence:
+                return None
+            if generation != self.generation:
+                self.remap(data_name.rstrip(b"\0").decode(), capacity, cells, generation)
+                if generation != self.generation:
+                    return None
+            stats = dict(zip((name for name, _ in FRAME_FIELDS),
+                             FRAME.unpack_from(self.header.buf, HEADER.size + front * FRAME.size)))
+            # Stats are copied out, so they are only used if no publish happened meanwhile
+            if HEADER.unpack_from(self.header.buf)[3] == sequence:
+                break
+        else:
+            return None
+        stats["width"], stats["height"] = width, height
+        count, cells = stats["count"], stats["rows"] * stats["columns"]
+        columns = {name: column[:count] for name, column in self.buffers[front].items() if name != "biomass"}
+        columns["biomass"] = self.buffers[front]["biomass"][:cells].reshape(stats["rows"], stats["columns"])
+        return stats, columns
+
+    def remap(self, name: str, capacity: int, cells: int, generation: int):
+        try:
+            data = attach(name)
+        except FileNotFoundError:
+            return  # already replaced again; the next read picks up the newer one
+        self.release()
+        self.data = data
+        self.buffers = views(data, layout(capacity, cells)[0])
+        self.generation = generation
+
+    def release(self):
+        self.buffers = []
+        if self.data is not None:
+            try:
+                self.data.close()
+            except BufferError:
+                pass  # a caller still holds views into it; the mapping goes when they do
+            self.data = None
+
+    def send(self, *command):
+        if self.closed:
+            return
+        try:
+            self.connection.send(command)
+        except OSError:
+            self.closed = True
+
+    def alive(self) -> bool:
+        # The simulation never writes to the connection, so it only becomes readable when the run ends
+        if not self.closed and self.connection.poll():
+            try:
+                self.connection.recv()
+            except (EOFError, OSError):
+                self.closed = True
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+        self.connection.close()
+        self.release()
+        self.header.close()
@@ -0,0 +1,538 @@
+import hashlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from brains import RandomBrain, SENSORS, ENERGY, HEALTH, FOOD_DX, THREAT_DX, NIGHT, TEMPERATURE
+from entities import (Entity, Species, Sex, DamageType, TaskType, DNA, Coordinate, GENE_SCHEMA, WEIGHT_MUTATION_SCALE,
+                      COMMON_GENES, RESIST_SLOT, FIGHTS)
+from events import EventKind, DeathCause
+
+GENES = ("size", "damage", "walking_speed", "sprinting_speed", "blunt_resist", "sharp_resist",
+         "nocturnal", "growth_rate", "diet")
+GENE_INDEX = {gene: i for i, gene in enumerate(GENES)}
+# Columns of each species' genes in its own GENE_SCHEMA order
+SCHEMA_COLUMNS = {species: [GENE_INDEX[gene] for gene in schema] for species, schema in GENE_SCHEMA.items()}
+
+SPECIES = list(Species)
+SEXES = list(Sex)
+DAMAGE_TYPES = list(DamageType)
+TASKS = list(TaskType)
+# The interaction tables as arrays indexed by column codes: the gene column resisting each damage type
+# (plants deal no damage, so code 0 is never looked up) and whether each species takes a blow
+RESIST_COLUMN = np.array([0] + [GENE_INDEX[COMMON_GENES[RESIST_SLOT[kind]]] for kind in DAMAGE_TYPES])
+FIGHTING = np.array([False] + [FIGHTS[species] for species in SPECIES])
+
+SCALAR_COLUMNS = {
+    "id": np.int64,
+    "x": np.float64,
+    "y": np.float64,
+    "energy": np.float64,
+    "health": np.float64,
+    "age": np.int64,
+    "species": np.int8,
+    "sex": np.int8,  # 0 for plants, otherwise Sex.value
+    "damage_type": np.int8,  # 0 for plants, otherwise DamageType.value
+    "task": np.int8,
+}
+
+# Upper bound on elements in one pairwise distance block
+CHUNK_ELEMENTS = 1 << 22
+
+
+def living(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    # Which rows survive the end of a tick
+    return (columns["health"] > 0) & (columns["energy"] > 0) & (columns["age"] <= 1000)
+
+
+def rng_from_seed(seed: Optional[str]) -> np.random.Generator:
+    if seed is None:
+        return np.random.default_rng()
+    digest = hashlib.sha256(str(seed).encode()).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], "little"))
+
+
+class NumpyEngine:
+    name = "numpy"
+
+    def __init__(self, env, prey: Dict[Species, tuple]):
+        self.env = env
+        self.rng = rng_from_seed(env.seed)
+        self.brain = env.brain or RandomBrain()
+        # Every column lives at the front of a larger buffer that doubles when it fills, so appending a row
+        # doesn't copy the population; columns, genes and weights are views of the rows in use
+        self.storage: Dict[str, np.ndarray] = {}
+        self.columns: Dict[str, np.ndarray] = {}
+        self.genes = np.empty((0, len(GENES)), np.float64)
+        self.weights = np.empty((0, self.brain.weights), np.float64)
+        self.adopt(self.allocate(0))
+        self.next_id = 0
+        self.prey_matrix = np.zeros((len(SPECIES) + 1, len(SPECIES) + 1), bool)
+        for predator, prey_species in prey.items():
+            for species in prey_species:
+                self.prey_matrix[predator.value, species.value] = True
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    @property
+    def capacity(self) -> int:
+        return len(self.storage["id"])
+
+    def allocate(self, capacity: int) -> Dict[str, np.ndarray]:
+        storage = {name: np.empty(capacity, dtype) for name, dtype in SCALAR_COLUMNS.items()}
+        storage["genes"] = np.empty((capacity, len(GENES)), np.float64)
+        storage["weights"] = np.empty((capacity, self.brain.weights), np.float64)
+        return storage
+
+    def adopt(self, storage: Dict[str, np.ndarray], count: Optional[int] = None):
+        # Takes over `storage` as the buffers, with its first `count` rows in use (all of them by default)
+        self.storage = storage
+        self.resize(self.capacity if count is None else count)
+
+    def resize(self, count: int):
+        # Sets the number of rows in use, growing the buffers first if they are too small
+        if count > self.capacity:
+            storage = self.allocate(max(count, 2 * self.capacity, 1024))
+            used = len(self)
+            for name, column in self.storage.items():
+                storage[name][:used] = column[:used]
+            self.storage = storage
+        self.columns = {name: self.storage[name][:count] for name in SCALAR_COLUMNS}
+        self.genes = self.storage["genes"][:count]
+        self.weights = self.storage["weights"][:count]
+
+    def keep(self, alive: np.ndarray):
+        # Compacts the rows where `alive` is set to the front, keeping their order
+        count = int(alive.sum())
+        for name in SCALAR_COLUMNS:
+            self.storage[name][:count] = self.columns[name][alive]
+        self.storage["genes"][:count] = self.genes[alive]
+        self.storage["weights"][:count] = self.weights[alive]
+        self.resize(count)
+
+    def add(self, entity: Entity):
+        genes = np.array([[float(entity.dna.gene(gene)) for gene in GENES]])
+        row = {
+            "x": entity.location.x,
+            "y": entity.location.y,
+            "energy": entity.energy,
+            "health": entity.health,
+            "age": entity.age,
+            "species": entity.species.value,
+            "sex": entity.sex.value if entity.sex else 0,
+            "damage_type": entity.damage_type.value if entity.damage_type else 0,
+            "task": entity.task.value,
+        }
+        weights = np.array([entity.dna.weights]) if entity.dna.weights is not None else None
+        self.append({name: np.array([value]) for name, value in row.items()}, genes, weights)
+        entity.id = self.next_id - 1
+
+    def append(self, rows: Dict[str, np.ndarray], genes: np.ndarray, weights: Optional[np.ndarray] = None):
+        count = len(genes)
+        rows["id"] = np.arange(self.next_id, self.next_id + count)
+        if not count:
+            return
+        if weights is None:
+            weights = self.brain.initial_weights(count, self.rng)
+        self.next_id += count
+        start = len(self)
+        self.resize(start + count)
+        for name in SCALAR_COLUMNS:
+            self.columns[name][start:] = rows[name]
+        self.genes[start:] = genes
+        self.weights[start:] = weights
+        self.update_stats(self.env.stats.add, rows["species"], genes)
+
+    def update_stats(self, update, species: np.ndarray, genes: np.ndarray):
+        for code, row in zip(species.tolist(), genes.tolist()):
+            kind = SPECIES[code - 1]
+            update(kind, [row[i] for i in SCHEMA_COLUMNS[kind]])
+
+    def new_rows(self, x: np.ndarray, y: np.ndarray, species: np.ndarray,
+                 rng: Optional[np.random.Generator] = None) -> Dict[str, np.ndarray]:
+        count = len(x)
+        animal = species != Species.PLANT.value
+        rng = self.rng if rng is None else rng
+        return {
+            "x": x,
+            "y": y,
+            "energy": np.full(count, 100.0),
+            "health": np.full(count, 100.0),
+            "age": np.zeros(count, np.int64),
+            "species": species,
+            "sex": np.where(animal, rng.integers(1, len(SEXES) + 1, count), 0),
+            "damage_type": np.where(animal, rng.integers(1, len(DAMAGE_TYPES) + 1, count), 0),
+            "task": np.full(count, TaskType.IDLE.value),
+        }
+
+    def row_of(self, entity_id: int) -> Optional[int]:
+        # Ids are handed out in increasing order and compaction keeps order, so the column stays sorted
+        ids = self.columns["id"]
+        row = int(np.searchsorted(ids, entity_id))
+        if row < len(ids) and ids[row] == entity_id:
+            return row
+        return None
+
+    def tick(self):
+        # Newborns act in the tick they are born, as children appended to Environment.entities do
+        start = 0
+        newborn = False
+        while start < len(self):
+            born = len(self)
+            self.step(start, newborn)
+            start = born
+            newborn = True
+
+        # Remove entities after processing all of them
+        deaths = self.remove_dead()
+        profiler = self.env.profiler
+        if profiler is not None:
+            profiler.lap("removal")
+            profiler.count("deaths", deaths)
+
+        # Spontaneous plant growth
+        if self.env.vegetation is None and self.rng.random() < 0.1:  # 10% chance each tick
+            ids = self.spawn(Species.PLANT, 1)
+            if self.env.events is not None:
+                self.env.events.extend(self.env.ticks, EventKind.SPAWN, [Species.PLANT.value], ids.tolist())
+        if profiler is not None:
+            profiler.lap("spawn")
+
+    def remove_dead(self) -> int:
+        alive = living(self.columns)
+        dead = np.flatnonzero(~alive)
+        if len(dead):
+            self.bury(dead)
+            self.keep(alive)
+        return len(dead)
+
+    def bury(self, dead: np.ndarray):
+        # Death events and stats for the rows about to be removed
+        c = self.columns
+        events = self.env.events
+        if events is not None:
+            cause = np.where(c["health"][dead] <= 0, DeathCause.HEALTH.value,
+                             np.where(c["energy"][dead] <= 0, DeathCause.ENERGY.value, DeathCause.AGE.value))
+            events.extend(self.env.ticks, EventKind.DEATH, c["species"][dead].tolist(), c["id"][dead].tolist(),
+                          amount=c["age"][dead].tolist(), cause=cause.tolist())
+        self.update_stats(self.env.stats.remove, c["species"][dead], self.genes[dead])
+
+    def step(self, start: int, newborn: bool = False):
+        # Steps the rows from `start` to the end
+        profiler = self.env.profiler
+        c = self.columns
+        rows = np.arange(start, len(self))
+
+        # Think: one brain call for every animal, plants stay idle
+        direction, task = self.decide(rows, newborn)
+        c["task"][rows] = task
+        if profiler is not None:
+            profiler.lap("think")
+
+        self.move(rows, direction, task)
+        if profiler is not None:
+            profiler.lap("move")
+
+        # Perform the chosen tasks
+        eaters = rows[task == TaskType.EATING.value]
+        self.feed(*self.hunt(self.graze(eaters)))
+        if profiler is not None:
+            profiler.lap("eat_lookup")
+            profiler.count("food_queries", len(eaters))
+        parents = rows[task == TaskType.REPRODUCING.value]
+        children = self.reproduce(parents)
+        if profiler is not None:
+            profiler.lap("reproduce_lookup")
+            profiler.count("partner_queries", len(parents))
+            profiler.count("births", len(children[1]) if children is not None else 0)
+
+        self.settle(rows, children)
+        if profiler is not None:
+            profiler.lap("act")
+
+    def decide(self, rows: np.ndarray, newborn: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        count = len(rows)
+        task = np.full(count, TaskType.IDLE.value)
+        direction = np.zeros((count, 2))
+        animal = self.columns["species"][rows] != Species.PLANT.value
+        animals = rows[animal]
+        # With a brain set newborns sit out their first tick, as in Environment.tick
+        if len(animals) and not (newborn and self.env.brain is not None):
+            weights = self.weights[animals] if self.brain.weights else None
+            rng = self.stream(animals)
+            direction[animal], task[animal] = self.brain.decide(self.sensors(animals), weights, rng)
+        return direction, task
+
+    def stream(self, rows: np.ndarray) -> np.random.Generator:
+        # What the draws made for `rows` come from; one generator for everything here
+        return self.rng
+
+    def move(self, rows: np.ndarray, direction: np.ndarray, task: np.ndarray):
+        c = self.columns
+        genes = self.genes[rows]
+        speed = np.where(task == TaskType.EATING.value,
+                         genes[:, GENE_INDEX["sprinting_speed"]], genes[:, GENE_INDEX["walking_speed"]])
+        c["x"][rows] = np.clip(c["x"][rows] + direction[:, 0] * speed, 0, self.env.width)
+        c["y"][rows] = np.clip(c["y"][rows] + direction[:, 1] * speed, 0, self.env.height)
+
+    def settle(self, rows: np.ndarray, children):
+        # End of step bookkeeping: energy use, plant growth, ageing, and the births joining the columns
+        c = self.columns
+        plant = c["species"][rows] == Species.PLANT.value
+        c["energy"][rows] = np.maximum(0, c["energy"][rows] - 1) + self.genes[rows, GENE_INDEX["growth_rate"]] * plant
+        c["age"][rows] += 1
+        if children is not None:
+            born, born_genes, born_weights, initiators, partners = children
+            self.append(born, born_genes, born_weights)
+            if self.env.events is not None:
+                self.env.events.extend(self.env.ticks, EventKind.BIRTH, born["species"].tolist(), born["id"].tolist(),
+                                       c["id"][initiators].tolist(), c["id"][partners].tolist())
+
+    def spawn(self, species: Species, count: int) -> np.ndarray:
+        x = self.rng.uniform(0, self.env.width, count)
+        y = self.rng.uniform(0, self.env.height, count)
+        rows = self.new_rows(x, y, np.full(count, species.value))
+        self.append(rows, self.random_genes(species, count))
+        return rows["id"]
+
+    def random_genes(self, species: Species, count: int) -> np.ndarray:
+        genes = np.zeros((count, len(GENES)))
+        for name, low, high in (("size", 0.5, 2.0), ("damage", 1, 10), ("walking_speed", 1, 5),
+                                ("sprinting_speed", 3, 10), ("blunt_resist", 0, 1), ("sharp_resist", 0, 1)):
+            genes[:, GENE_INDEX[name]] = self.rng.uniform(low, high, count)
+        genes[:, GENE_INDEX["nocturnal"]] = self.rng.integers(0, 2, count)
+        if species == Species.PLANT:
+            genes[:, GENE_INDEX["growth_rate"]] = self.rng.uniform(0.1, 0.5, count)
+        else:
+            low, high = {Species.HERBIVORE: (0, 0.3), Species.OMNIVORE: (0.3, 0.7), Species.CARNIVORE: (0.7, 1.0)}[species]
+            genes[:, GENE_INDEX["diet"]] = self.rng.uniform(low, high, count)
+        return genes
+
+    def sensors(self, rows: np.ndarray) -> np.ndarray:
+        c = self.columns
+        sensors = np.zeros((len(rows), len(SENSORS)))
+        sensors[:, ENERGY] = c["energy"][rows]
+        sensors[:, HEALTH] = c["health"][rows]
+        sensors[:, NIGHT] = self.env.night
+        sensors[:, TEMPERATURE] = self.env.temperature
+        if not self.brain.senses_surroundings:
+            return sensors
+        species = c["species"]
+        for code in np.unique(species[rows]):
+            mask = species[rows] == code
+            group = rows[mask]
+            # Food is whatever this species eats, threats whatever eats it
+            for column, targets in ((FOOD_DX, self.prey_matrix[code]), (THREAT_DX, self.prey_matrix[:, code])):
+                candidates = np.flatnonzero(targets[species])
+                if len(candidates):
+                    found = self.nearest(group, candidates)
+                    sensors[mask, column] = c["x"][found] - c["x"][group]
+                    sensors[mask, column + 1] = c["y"][found] - c["y"][group]
+        return sensors
+
+    def nearest(self, rows: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        x, y = self.columns["x"], self.columns["y"]
+        cx, cy = x[candidates], y[candidates]
+        step = max(1, CHUNK_ELEMENTS // max(1, len(candidates)))
+        found = np.empty(len(rows), np.int64)
+        for start in range(0, len(rows), step):
+            chunk = rows[start:start + step]
+            d2 = (x[chunk, None] - cx[None, :]) ** 2 + (y[chunk, None] - cy[None, :]) ** 2
+            found[start:start + step] = candidates[np.argmin(d2, axis=1)]
+        return found
+
+    def in_contact(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        x, y = self.columns["x"], self.columns["y"]
+        size = self.genes[:, GENE_INDEX["size"]]
+        return np.hypot(x[a] - x[b], y[a] - y[b]) < size[a] + size[b]
+
+    def graze(self, eaters: np.ndarray) -> np.ndarray:
+        # Plant eaters graze the cell under them first and only hunt when it is bare; returns who still hunts
+        vegetation = self.env.vegetation
+        if vegetation is None:
+            return eaters
+        c = self.columns
+        size = self.genes[:, GENE_INDEX["size"]]
+        diet = self.genes[:, GENE_INDEX["diet"]]
+        grazing = self.prey_matrix[c["species"][eaters], Species.PLANT.value]
+        grazers = eaters[grazing]
+        gain = vegetation.graze_many(c["x"][grazers], c["y"][grazers], size[grazers] * 10 * (1 - diet[grazers]))
+        c["energy"][grazers] = np.minimum(100, c["energy"][grazers] + gain)
+        fed = gain > 0
+        if self.env.events is not None:
+            self.env.events.extend(self.env.ticks, EventKind.EAT, c["species"][grazers[fed]].tolist(),
+                                   c["id"][grazers[fed]].tolist(), amount=gain[fed].tolist())
+        return np.concatenate([eaters[~grazing], grazers[~fed]])
+
+    def hunt(self, eaters: np.ndarray, nearby: Optional[np.ndarray] = None) -> Tuple[np.ndarray, ...]:
+        # Who catches what, with the energy and blow of each catch, without applying them. `nearby` masks
+        # the rows worth searching; leaving out only rows too far away to touch gives the same answer as
+        # searching all.
+        c = self.columns
+        hunters, prey = [np.empty(0, np.int64)], [np.empty(0, np.int64)]
+        for predator in np.unique(c["species"][eaters]):
+            group = eaters[c["species"][eaters] == predator]
+            targets = self.prey_matrix[predator][c["species"]]
+            candidates = np.flatnonzero(targets if nearby is None else targets & nearby)
+            if not len(candidates):
+                continue
+            food = self.nearest(group, candidates)
+            hit = self.in_contact(group, food)
+            hunters.append(group[hit])
+            prey.append(food[hit])
+        hunters, prey = np.concatenate(hunters), np.concatenate(prey)
+        return (hunters, prey) + self.interact(hunters, prey)
+
+    def interact(self, hunters: np.ndarray, prey: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # The meal and the blow of every (hunter, prey) contact at once, as entities.predation works them
+        # out for the object engine
+        c = self.columns
+        genes = self.genes
+        diet = genes[:, GENE_INDEX["diet"]]
+        gain = genes[prey, GENE_INDEX["size"]] * 10 * (1 - np.abs(diet[hunters] - diet[prey]))
+        resist = genes[prey, RESIST_COLUMN[c["damage_type"][hunters]]]
+        blow = genes[hunters, GENE_INDEX["damage"]] * (1 - resist) * FIGHTING[c["species"][prey]]
+        return gain, blow
+
+    def feed(self, eaters: np.ndarray, food: np.ndarray, gain: np.ndarray, blow: np.ndarray):
+        c = self.columns
+        c["energy"][eaters] = np.minimum(100, c["energy"][eaters] + gain)
+        self.wound(eaters, food, gain, blow)
+
+    def wound(self, eaters: np.ndarray, food: np.ndarray, gain: np.ndarray, blow: np.ndarray):
+        # The prey's side of the meals: the blow and the bite both come off its health
+        c = self.columns
+        np.subtract.at(c["health"], food, blow + gain)
+        events = self.env.events
+        if events is not None:
+            struck = blow > 0
+            strikers, struck_food = eaters[struck], food[struck]
+            events.extend(self.env.ticks, EventKind.ATTACK, c["species"][strikers].tolist(),
+                          c["id"][strikers].tolist(), c["id"][struck_food].tolist(), amount=blow[struck].tolist())
+            events.extend(self.env.ticks, EventKind.EAT, c["species"][eaters].tolist(),
+                          c["id"][eaters].tolist(), c["id"][food].tolist(), amount=gain.tolist())
+
+    def reproduce(self, parents: np.ndarray, nearby: Optional[np.ndarray] = None):
+        c = self.columns
+        initiators, partners = [], []
+        for species in np.unique(c["species"][parents]):
+            for sex in np.unique(c["sex"][parents]):
+                group = parents[(c["species"][parents] == species) & (c["sex"][parents] == sex)]
+                mates = (c["species"] == species) & (c["sex"] != sex)
+                candidates = np.flatnonzero(mates if nearby is None else mates & nearby)
+                if not len(group) or not len(candidates):
+                    continue
+                partner = self.nearest(group, candidates)
+                hit = self.in_contact(group, partner)
+                initiators.append(group[hit])
+                partners.append(partner[hit])
+        if not initiators:
+            return None
+        a, b = np.concatenate(initiators), np.concatenate(partners)
+        if not len(a):
+            return None
+        rng = self.stream(a)
+        genes = (self.genes[a] + self.genes[b]) / 2
+        mutate = rng.random(genes.shape) < self.env.mutation_rate
+        genes *= np.where(mutate, rng.uniform(0.8, 1.2, genes.shape), 1)
+        weights = (self.weights[a] + self.weights[b]) / 2
+        if self.brain.weights:
+            mutate = rng.random(weights.shape) < self.env.mutation_rate
+            weights += np.where(mutate, rng.normal(0, WEIGHT_MUTATION_SCALE, weights.shape), 0)
+        return self.new_rows(c["x"][a].copy(), c["y"][a].copy(), c["species"][a], rng), genes, weights, a, b
+
+    def frame(self) -> Tuple[List[float], List[float], List[float], List[Species]]:
+        c = self.columns
+        return (c["x"].tolist(), c["y"].tolist(), self.genes[:, GENE_INDEX["size"]].tolist(),
+                [SPECIES[code - 1] for code in c["species"].tolist()])
+
+    def view(self, row: int) -> 'EntityView':
+        return EntityView(self, int(self.columns["id"][row]))
+
+
+class EntityView:
+    def __init__(self, engine: NumpyEngine, entity_id: int):
+        self.engine = engine
+        self.id = entity_id
+        self.cache: Dict[str, float] = {}
+        self.refresh()
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, EntityView) and other.engine is self.engine and other.id == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def refresh(self):
+        # A dead entity keeps reporting the last values it had, like a removed Entity object does
+        row = self.engine.row_of(self.id)
+        if row is None:
+            return
+        for name in SCALAR_COLUMNS:
+            self.cache[name] = self.engine.columns[name][row].item()
+        for gene, value in zip(GENES, self.engine.genes[row]):
+            self.cache[gene] = float(value)
+
+    def get(self, name: str):
+        self.refresh()
+        return self.cache[name]
+
+    @property
+    def location(self) -> Coordinate:
+        self.refresh()
+        return Coordinate(self.cache["x"], self.cache["y"])
+
+    @property
+    def species(self) -> Species:
+        return SPECIES[self.get("species") - 1]
+
+    @property
+    def sex(self) -> Optional[Sex]:
+        sex = self.get("sex")
+        return SEXES[sex - 1] if sex else None
+
+    @property
+    def damage_type(self) -> Optional[DamageType]:
+        damage_type = self.get("damage_type")
+        return DAMAGE_TYPES[damage_type - 1] if damage_type else None
+
+    @property
+    def task(self) -> TaskType:
+        return TASKS[self.get("task") - 1]
+
+    @property
+    def dna(self) -> DNA:
+        self.refresh()
+        return DNA.from_genes({gene: self.cache[gene] for gene in GENES}, self.species)
+
+    health = property(lambda self: self.get("health"))
+    energy = property(lambda self: self.get("energy"))
+    age = property(lambda self: self.get("age"))
+    size = property(lambda self: self.get("size"))
+    diet = property(lambda self: self.get("diet"))
+    damage = property(lambda self: self.get("damage"))
+    growth_rate = property(lambda self: self.get("growth_rate"))
+    nocturnal = property(lambda self: self.get("nocturnal"))
+
+
+class EngineEntities:
+    # Read-only sequence standing in for Environment.entities when the numpy engine is active
+    def __init__(self, engine: NumpyEngine):
+        self.engine = engine
+
+    def __len__(self) -> int:
+        return len(self.engine)
+
+    def __getitem__(self, row: int) -> EntityView:
+        if row < 0:
+            row += len(self.engine)
+        if not 0 <= row < len(self.engine):
+            raise IndexError(row)
+        return self.engine.view(row)
+
+    def __iter__(self) -> Iterator[EntityView]:
+        return (self.engine.view(row) for row in range(len(self.engine)))
+
+    def __contains__(self, entity) -> bool:
+        return isinstance(entity, EntityView) and self.engine.row_of(entity.id) is not None
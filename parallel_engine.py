@@ -0,0 +1,401 @@
+import multiprocessing
+import os
+import weakref
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from brains import RandomBrain
+from entities import Species, TaskType
+from numpy_engine import NumpyEngine, GENES, GENE_INDEX, SCALAR_COLUMNS, living
+
+# The engine's own columns live in one shared block with the workers, next to where each row moved to
+# in the current round. None as the width means one column per brain weight.
+SHARED = tuple((name, dtype, 0) for name, dtype in SCALAR_COLUMNS.items()) + (
+    ("genes", np.float64, len(GENES)), ("weights", np.float64, None),
+    ("moved_x", np.float64, 0), ("moved_y", np.float64, 0),
+)
+ALIGN = 64
+# Rows sampled to place the cuts between strips
+SAMPLE = 4096
+# Odd constants of the splitmix64 generator, which RowStreams hashes with
+GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+MIX = (np.uint64(30), np.uint64(0xBF58476D1CE4E5B9), np.uint64(27), np.uint64(0x94D049BB133111EB), np.uint64(31))
+MASK = (1 << 64) - 1
+
+
+def mix(z: np.ndarray) -> np.ndarray:
+    # splitmix64's finaliser, which spreads every input bit over the whole output
+    first, multiplier, second, other, last = MIX
+    z = (z ^ (z >> first)) * multiplier
+    z = (z ^ (z >> second)) * other
+    return z ^ (z >> last)
+
+
+class RowStreams:
+    # Stands in for the np.random.Generator a strip draws from. Each number is a hash of the round's seed,
+    # the entity its row belongs to, which draw it is and its place within the row, so a row gets the same
+    # numbers whichever strip it falls in and however many strips there are. Draws are shaped (rows, ...).
+    def __init__(self, seed: int, keys: np.ndarray):
+        self.seed = seed
+        self.keys = keys.astype(np.uint64)
+        self.draws = 0
+
+    def bits(self, size) -> np.ndarray:
+        shape = (size,) if np.isscalar(size) else tuple(size)
+        self.draws += 1
+        salt = np.uint64((self.seed + self.draws * int(GOLDEN)) & MASK)
+        places = np.arange(int(np.prod(shape[1:])), dtype=np.uint64)
+        z = mix(mix(self.keys ^ salt)[:, None] + places * GOLDEN)
+        return z.reshape(shape)
+
+    def random(self, size) -> np.ndarray:
+        return (self.bits(size) >> np.uint64(11)) * (1.0 / (1 << 53))
+
+    def uniform(self, low: float, high: float, size) -> np.ndarray:
+        return low + (high - low) * self.random(size)
+
+    def normal(self, loc: float, scale: float, size) -> np.ndarray:
+        # Box-Muller, from a uniform in (0, 1] and one in [0, 1)
+        radius = np.sqrt(-2 * np.log(1 - self.random(size)))
+        return loc + scale * radius * np.cos(2 * np.pi * self.random(size))
+
+    def integers(self, low: int, high: int, size) -> np.ndarray:
+        return low + (self.bits(size) % np.uint64(high - low)).astype(np.int64)
+
+
+class StripEngine(NumpyEngine):
+    # The engine a worker runs its strip on: what each row draws is keyed by its entity's id
+    seed = 0
+
+    def stream(self, rows: np.ndarray) -> RowStreams:
+        return RowStreams(self.seed, self.columns["id"][rows])
+
+
+class SharedColumns:
+    # One shared memory block holding every SHARED column for up to `capacity` rows
+    def __init__(self, capacity: int, weights: int, name: Optional[str] = None):
+        self.capacity = capacity
+        layout = []
+        size = 0
+        for column, dtype, width in SHARED:
+            shape = (capacity,) if width == 0 else (capacity, weights if width is None else width)
+            layout.append((column, dtype, shape, size))
+            size = -(-(size + int(np.prod(shape)) * np.dtype(dtype).itemsize) // ALIGN) * ALIGN
+        self.memory = SharedMemory(name=name, create=name is None, size=max(size, 1))
+        self.arrays: Dict[str, np.ndarray] = {column: np.ndarray(shape, dtype, self.memory.buf, offset)
+                                              for column, dtype, shape, offset in layout}
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def close(self, unlink: bool = False):
+        # The views have to go before the mapping can be closed; the name can go at any time
+        self.arrays.clear()
+        if unlink:
+            self.memory.unlink()
+        self.memory.close()
+
+
+def work(connection, brain, prey: Dict[Species, tuple], width: float, height: float):
+    # Worker process: runs its strip of each round against the shared columns, on a NumpyEngine
+    # that holds no columns of its own
+    env = SimpleNamespace(seed=None, brain=brain, width=width, height=height, night=False, temperature=20,
+                          mutation_rate=0.1, events=None, vegetation=None, profiler=None)
+    engine = StripEngine(env, prey)
+    shared = None
+    strip: Dict[str, object] = {}  # what one command leaves for the next
+    while True:
+        command, args = connection.recv()
+        if command == "stop":
+            break
+        if command == "attach":
+            engine.columns, engine.genes, engine.weights = {}, None, None
+            if shared is not None:
+                shared.close()
+            shared = SharedColumns(*args)
+            connection.send(None)
+            continue
+        a = shared.arrays
+        if command == "sweep":
+            # Finds the dead in an equal range of rows
+            start, stop = args["start"], args["stop"]
+            alive = living({name: a[name][start:stop] for name in ("health", "energy", "age")})
+            strip.update(start=start, stop=stop, alive=alive)
+            connection.send(start + np.flatnonzero(~alive))
+            continue
+        if command == "gather":
+            # Copies out the range's survivors before any range is written back over it
+            alive = strip.pop("alive")
+            strip["kept"] = {name: column[strip["start"]:strip["stop"]][alive] for name, column in a.items()}
+            connection.send(None)
+            continue
+        if command == "place":
+            offset = args["offset"]
+            for name, kept in strip.pop("kept").items():
+                a[name][offset:offset + len(kept)] = kept
+            connection.send(None)
+            continue
+        count = args["count"]
+        engine.genes = a["genes"][:count]
+        engine.weights = a["weights"][:count]
+        columns = {name: a[name][:count] for name in SCALAR_COLUMNS}
+        # Moves go to the moved columns, so the other strips still sense everyone where they started
+        moved = dict(columns, x=a["moved_x"][:count], y=a["moved_y"][:count])
+        if command == "think":
+            # The strip is the round's rows between two cuts along x
+            x = columns["x"][args["start"]:]
+            rows = args["start"] + np.flatnonzero((x >= args["low"]) & (x < args["high"]))
+            env.night, env.temperature = args["night"], args["temperature"]
+            engine.seed = args["seed"]
+            engine.columns = columns
+            direction, task = engine.decide(rows, args["newborn"])
+            columns["task"][rows] = task
+            engine.columns = moved
+            engine.move(rows, direction, task)
+            eaters = rows[task == TaskType.EATING.value]
+            parents = rows[task == TaskType.REPRODUCING.value]
+            strip.update(rows=rows, eaters=eaters, parents=parents)
+            connection.send((eaters if args["graze"] else None, len(eaters), len(parents)))
+        elif command == "act":
+            # Hunts, feeds and mates the strip, then settles it. Only the strip's own energy, age and
+            # position are written; wounds to prey, which may be in another strip, go back to the parent.
+            env.mutation_rate, engine.seed = args["mutation_rate"], args["seed"]
+            engine.columns = moved
+            rows, parents = strip.pop("rows"), strip.pop("parents")
+            hunters = strip.pop("eaters") if args["hunters"] is None else args["hunters"]
+            meals = engine.hunt(hunters, nearby(engine, hunters, args["reach"]))
+            eaters, _, gain, _ = meals
+            columns["energy"][eaters] = np.minimum(100, columns["energy"][eaters] + gain)
+            children = engine.reproduce(parents, nearby(engine, parents, args["reach"]))
+            engine.settle(rows, None)
+            # Other strips only read the moved columns in this phase, so the strip can take up its new places
+            columns["x"][rows] = moved["x"][rows]
+            columns["y"][rows] = moved["y"][rows]
+            connection.send((meals, children))
+        engine.columns, engine.genes, engine.weights = {}, None, None
+    strip.clear()
+    if shared is not None:
+        shared.close()
+
+
+def nearby(engine: NumpyEngine, rows: np.ndarray, reach: float) -> Optional[np.ndarray]:
+    # Rows within reach of the strip along x; anything further out can't be touching any of `rows`
+    if not len(rows):
+        return None
+    x = engine.columns["x"]
+    xs = x[rows]
+    return (x >= xs.min() - reach) & (x <= xs.max() + reach)
+
+
+class Workers:
+    # The worker processes and the shared blocks they map, kept apart from the engine so a finalizer can stop them
+    def __init__(self, count: int, brain, prey: Dict[Species, tuple], width: float, height: float, weights: int):
+        context = multiprocessing.get_context()
+        # Started before the workers so they all report to this one tracker, which then sees the parent's
+        # unlink; a tracker of a worker's own would unlink the block the moment that worker exited
+        resource_tracker.ensure_running()
+        self.weights = weights
+        self.shared: Optional[SharedColumns] = None
+        self.retired: List[SharedColumns] = []
+        self.connections = []
+        self.processes = []
+        for _ in range(count):
+            parent, child = context.Pipe()
+            process = context.Process(target=work, args=(child, brain, prey, width, height), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def __len__(self) -> int:
+        return len(self.processes)
+
+    def allocate(self, capacity: int) -> Dict[str, np.ndarray]:
+        # A new block for the engine's storage, mapped by every worker. The old one is unlinked once they
+        # have moved over, but stays mapped here until the engine has copied out of it and let go of its views.
+        shared = SharedColumns(capacity, self.weights)
+        for connection in self.connections:
+            connection.send(("attach", (capacity, self.weights, shared.name)))
+        for connection in self.connections:
+            connection.recv()
+        if self.shared is not None:
+            self.shared.memory.unlink()
+            self.retired.append(self.shared)
+        self.shared = shared
+        return shared.arrays
+
+    def release(self):
+        # Closes the retired blocks nothing holds a view of any more
+        for shared in list(self.retired):
+            try:
+                shared.close()
+            except BufferError:
+                continue
+            self.retired.remove(shared)
+
+    def run(self, command: str, args: List[Optional[Dict]]) -> List:
+        # Every worker gets its strip's arguments, or sits the command out for None; results come back
+        # in strip order, whoever finishes first
+        busy = [(connection, strip) for connection, strip in zip(self.connections, args) if strip is not None]
+        for connection, strip in busy:
+            connection.send((command, strip))
+        return [connection.recv() for connection, _ in busy]
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self.connections:
+            connection.close()
+        if self.shared is not None:
+            self.shared.memory.unlink()
+            self.retired.append(self.shared)
+            self.shared = None
+        self.release()
+        self.connections, self.processes = [], []
+
+
+class ParallelEngine(NumpyEngine):
+    # The numpy engine with each step split across worker processes by strips of the world. The columns
+    # themselves live in shared memory, so nothing is copied to hand them to the workers. Each round the
+    # rows are cut at points along x into strips of about equal count, one per worker. Workers think and
+    # move their strip, then find meals and mates among the rows within touching distance of it, and feed,
+    # age and settle their own rows. The parent grazes, applies wounds and births in row order, and
+    # spawns; removal is swept by the workers too. What a row draws is keyed by its entity's id and a seed
+    # per round from the engine's generator, so a seed gives the same run whatever the worker count.
+    name = "parallel"
+
+    def __init__(self, env, prey: Dict[Species, tuple], workers: Optional[int] = None):
+        # The workers come first, since the columns are allocated in the blocks they share
+        self.workers = Workers(workers or os.cpu_count() or 1, env.brain, prey, env.width, env.height,
+                               (env.brain or RandomBrain()).weights)
+        self.finalizer = weakref.finalize(self, self.workers.close)
+        self.max_size = 0.0  # the largest size ever added, bounding how far apart two rows can touch
+        super().__init__(env, prey)
+
+    def close(self):
+        # Lets go of the views first, so the blocks can be closed; the engine is left empty
+        self.storage = {}
+        self.columns = {name: np.empty(0, dtype) for name, dtype in SCALAR_COLUMNS.items()}
+        self.genes = np.empty((0, len(GENES)))
+        self.weights = np.empty((0, self.brain.weights))
+        self.finalizer()
+
+    def allocate(self, capacity: int) -> Dict[str, np.ndarray]:
+        return self.workers.allocate(capacity)
+
+    def adopt(self, storage: Dict[str, np.ndarray], count: Optional[int] = None):
+        if storage is not self.workers.shared.arrays:
+            # Columns from elsewhere, e.g. a snapshot, are copied into a shared block
+            count = len(storage["id"]) if count is None else count
+            shared = self.allocate(count)
+            for name, column in storage.items():
+                shared[name][:count] = column[:count]
+            storage = shared
+        super().adopt(storage, count)
+        self.storage["moved_x"][:len(self)] = self.columns["x"]
+        self.storage["moved_y"][:len(self)] = self.columns["y"]
+        self.max_size = float(self.genes[:, GENE_INDEX["size"]].max(initial=0))
+
+    def append(self, rows: Dict[str, np.ndarray], genes: np.ndarray, weights: Optional[np.ndarray] = None):
+        start = len(self)
+        super().append(rows, genes, weights)
+        # Outside a round every row's moved position is where it is
+        self.storage["moved_x"][start:len(self)] = self.columns["x"][start:]
+        self.storage["moved_y"][start:len(self)] = self.columns["y"][start:]
+        if len(genes):
+            self.max_size = max(self.max_size, float(genes[:, GENE_INDEX["size"]].max()))
+
+    def step(self, start: int, newborn: bool = False):
+        profiler = self.env.profiler
+        self.workers.release()
+        count = len(self)
+        grazing = self.env.vegetation is not None
+        cuts = self.cuts(start)
+        # One seed per round for every strip; the rows' ids tell their draws apart
+        think_seed, act_seed = self.rng.integers(1 << 63, size=2).tolist()
+        thoughts = self.workers.run("think", [{"count": count, "start": start, "low": low, "high": high,
+                                               "seed": think_seed, "newborn": newborn, "graze": grazing,
+                                               "night": self.env.night, "temperature": self.env.temperature}
+                                              for low, high in cuts])
+        if profiler is not None:
+            profiler.lap("think")
+
+        hunters = [None] * len(cuts)
+        if grazing:
+            # The field is shared by every strip, so grazing stays here, at the moved positions and in row
+            # order, as cells run out the same way however the rows were cut; workers only hunt for who is
+            # still hungry
+            columns = self.columns
+            self.columns = dict(columns, x=self.storage["moved_x"][:count], y=self.storage["moved_y"][:count])
+            try:
+                hungry = self.graze(np.sort(np.concatenate([eaters for eaters, _, _ in thoughts])))
+            finally:
+                self.columns = columns
+            hunters = [eaters[np.isin(eaters, hungry)] for eaters, _, _ in thoughts]
+        results = self.workers.run("act", [{"count": count, "hunters": strip_hunters, "reach": 2 * self.max_size,
+                                            "seed": act_seed, "mutation_rate": self.env.mutation_rate}
+                                           for strip_hunters in hunters])
+        if profiler is not None:
+            profiler.lap("act")
+
+        # Wounds in hunter row order, so prey caught twice loses its health in the same order every time
+        eaters, food, gain, blow = (np.concatenate(column) for column in zip(*(meals for meals, _ in results)))
+        order = np.argsort(eaters, kind="stable")
+        self.wound(eaters[order], food[order], gain[order], blow[order])
+        children = merge_children([born for _, born in results if born is not None])
+        self.settle(np.empty(0, np.int64), children)
+        if profiler is not None:
+            profiler.lap("settle")
+            profiler.count("food_queries", sum(eaters for _, eaters, _ in thoughts))
+            profiler.count("partner_queries", sum(parents for _, _, parents in thoughts))
+            profiler.count("births", len(children[1]) if children is not None else 0)
+
+    def cuts(self, start: int) -> List[Tuple[float, float]]:
+        # Bounds along x splitting rows start.. into one strip per worker of about equal count, placed
+        # from a sample of the rows rather than by sorting them all
+        x = self.columns["x"][start:]
+        sample = x[::max(1, len(x) // SAMPLE)]
+        bounds = np.quantile(sample, np.linspace(0, 1, len(self.workers) + 1)[1:-1]).tolist()
+        bounds = [-np.inf] + bounds + [np.inf]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def remove_dead(self) -> int:
+        # Workers sweep equal ranges of rows for the dead, so only the dead are read here. The ranges
+        # from the first death on shift down: each copies out its survivors, then all write them back.
+        count = len(self)
+        bounds = np.linspace(0, count, len(self.workers) + 1).astype(np.int64).tolist()
+        ranges = list(zip(bounds[:-1], bounds[1:]))
+        swept = self.workers.run("sweep", [{"start": start, "stop": stop} for start, stop in ranges])
+        dead = np.concatenate(swept)
+        if not len(dead):
+            return 0
+        self.bury(dead)
+        first = next(i for i, rows in enumerate(swept) if len(rows))
+        offsets = np.cumsum([0] + [stop - start - len(rows) for (start, stop), rows in zip(ranges, swept)]).tolist()
+        self.workers.run("gather", [{} if i >= first else None for i in range(len(ranges))])
+        self.workers.run("place", [{"offset": offsets[i]} if i >= first else None for i in range(len(ranges))])
+        self.resize(count - len(dead))
+        return len(dead)
+
+
+def merge_children(children: List[tuple]):
+    # Births from every strip in the row order of their initiators, so they get the same ids however the
+    # rows were cut, in the form NumpyEngine.reproduce returns them
+    if not children:
+        return None
+    initiators = np.concatenate([born[3] for born in children])
+    order = np.argsort(initiators, kind="stable")
+    rows = {name: np.concatenate([born[0][name] for born in children])[order] for name in children[0][0]}
+    return (rows,) + tuple(np.concatenate([born[i] for born in children])[order] for i in range(1, 5))
@@ -0,0 +1,82 @@
+import csv
+import gc
+import json
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+
+class Profiler:
+    # Per-phase timings and counters for ticks and frames, kept for the last `window` of each.
+    # Code under measurement holds an Optional[Profiler] and skips every call when it is None,
+    # so a disabled profiler costs one None check per phase.
+    def __init__(self, window: int = 600):
+        self.window = window
+        self.records: Dict[str, Deque[Dict[str, float]]] = {}
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.started = 0.0
+        self.last = 0.0
+        self.blocks = 0
+        self.collections = 0
+
+    def begin(self):
+        self.phases = {}
+        self.counters = {}
+        self.blocks = sys.getallocatedblocks()
+        self.collections = sum(stats["collections"] for stats in gc.get_stats())
+        self.started = self.last = time.perf_counter()
+
+    def lap(self, phase: str):
+        # Charge the time since the previous lap (or begin) to this phase
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def count(self, counter: str, amount: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def end(self, kind: str) -> Dict[str, float]:
+        now = time.perf_counter()
+        # Timings are stored in milliseconds under a _ms suffix, everything else is a count
+        record = {"time": time.time(), "total_ms": (now - self.started) * 1000}
+        record.update((f"{phase}_ms", seconds * 1000) for phase, seconds in self.phases.items())
+        record.update(self.counters)
+        record["allocated_blocks"] = sys.getallocatedblocks() - self.blocks
+        record["gc_collections"] = sum(stats["collections"] for stats in gc.get_stats()) - self.collections
+        records = self.records.get(kind)
+        if records is None:
+            records = self.records[kind] = deque(maxlen=self.window)
+        records.append(record)
+        return record
+
+    def summary(self, kind: str, last: int = 60) -> Dict[str, float]:
+        records = list(self.records.get(kind, ()))[-last:]
+        if not records:
+            return {}
+        keys = list(dict.fromkeys(key for record in records for key in record if key != "time"))
+        return {key: sum(record.get(key, 0) for record in records) / len(records) for key in keys}
+
+    def rows(self) -> List[Dict[str, float]]:
+        return [dict(kind=kind, **record) for kind, records in self.records.items() for record in records]
+
+    def export(self, path: str):
+        if path.endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
+
+    def export_csv(self, path: str):
+        rows = self.rows()
+        fields: List[str] = []
+        for row in rows:
+            fields.extend(key for key in row if key not in fields)
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def export_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump({kind: list(records) for kind, records in self.records.items()}, f, indent=2)
@@ -0,0 +1,176 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pygame
+
+from entities import Species
+
+Color = Tuple[int, int, int]
+
+SPECIES_COLORS: Dict[Species, Color] = {
+    Species.PLANT: (0, 255, 0),  # Green
+    Species.HERBIVORE: (0, 0, 255),  # Blue
+    Species.OMNIVORE: (255, 165, 0),  # Orange
+    Species.CARNIVORE: (255, 0, 0),  # Red
+}
+UNKNOWN_COLOR = (128, 128, 128)  # Gray for unknown species
+VEGETATION_COLOR = (120, 200, 100)  # Fully grown vegetation, paler than plant sprites
+
+# Below this zoom entities are a pixel or two wide, so a density heatmap replaces the sprites
+HEATMAP_ZOOM = 0.35
+HEATMAP_CELL = 4  # screen pixels per heatmap cell
+
+
+class Camera:
+    def __init__(self, view_width: int, view_height: int):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.x = 0.0  # world coordinate at the left edge of the view
+        self.y = 0.0
+        self.zoom = 1.0
+
+    def reset(self):
+        self.x = self.y = 0.0
+        self.zoom = 1.0
+
+    def to_screen(self, x: float, y: float) -> Tuple[float, float]:
+        return (x - self.x) * self.zoom, (y - self.y) * self.zoom
+
+    def to_world(self, sx: float, sy: float) -> Tuple[float, float]:
+        return sx / self.zoom + self.x, sy / self.zoom + self.y
+
+    def contains(self, sx: float, sy: float) -> bool:
+        return 0 <= sx < self.view_width and 0 <= sy < self.view_height
+
+    def pan(self, dx: float, dy: float):
+        # Screen-space drag distances
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+
+    def zoom_at(self, factor: float, sx: float, sy: float):
+        # Keep the world point under the cursor fixed
+        wx, wy = self.to_world(sx, sy)
+        self.zoom = max(0.02, min(20.0, self.zoom * factor))
+        self.x = wx - sx / self.zoom
+        self.y = wy - sy / self.zoom
+
+    @property
+    def state(self) -> Tuple[float, float, float]:
+        return self.x, self.y, self.zoom
+
+
+class WorldRenderer:
+    def __init__(self, camera: Camera):
+        self.camera = camera
+        self.sprites: Dict[Tuple[Color, int], pygame.Surface] = {}
+        self.background: Optional[pygame.Surface] = None
+        self.background_key = None
+
+    def sprite(self, color: Color, radius: int) -> pygame.Surface:
+        key = (color, radius)
+        surface = self.sprites.get(key)
+        if surface is None:
+            surface = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+            pygame.draw.circle(surface, color, (radius, radius), radius)
+            self.sprites[key] = surface
+        return surface
+
+    def draw_background(self, screen: pygame.Surface, world_size: Tuple[int, int], show_grid: bool,
+                        grid_size: int):
+        # The grid only changes with the camera, so it is drawn once onto a cached surface
+        key = (self.camera.state, world_size, show_grid, grid_size)
+        if key != self.background_key:
+            self.background_key = key
+            self.background = self.render_background(world_size, show_grid, grid_size)
+        screen.blit(self.background, (0, 0))
+
+    def render_background(self, world_size: Tuple[int, int], show_grid: bool, grid_size: int) -> pygame.Surface:
+        camera = self.camera
+        surface = pygame.Surface((camera.view_width, camera.view_height))
+        surface.fill((255, 255, 255))  # White background
+        left, top = camera.to_screen(0, 0)
+        right, bottom = camera.to_screen(*world_size)
+        if show_grid and grid_size * camera.zoom >= 4:
+            first_x = max(0, int(camera.x // grid_size) * grid_size)
+            for x in range(first_x, world_size[0], grid_size):
+                sx = camera.to_screen(x, 0)[0]
+                if sx > camera.view_width:
+                    break
+                pygame.draw.line(surface, (200, 200, 200), (sx, top), (sx, bottom))
+            first_y = max(0, int(camera.y // grid_size) * grid_size)
+            for y in range(first_y, world_size[1], grid_size):
+                sy = camera.to_screen(0, y)[1]
+                if sy > camera.view_height:
+                    break
+                pygame.draw.line(surface, (200, 200, 200), (left, sy), (right, sy))
+        if camera.zoom != 1.0 or camera.x or camera.y:
+            pygame.draw.rect(surface, (160, 160, 160), pygame.Rect(left, top, right - left, bottom - top), 1)
+        return surface
+
+    def draw_vegetation(self, screen: pygame.Surface, vegetation):
+        import numpy as np
+        from vegetation import CAPACITY
+
+        # Only the cells in view are coloured, then scaled up and blitted in one go
+        camera = self.camera
+        cell = vegetation.cell_size
+        first_column, first_row = max(0, int(camera.x // cell)), max(0, int(camera.y // cell))
+        right, bottom = camera.to_world(camera.view_width, camera.view_height)
+        last_column = min(vegetation.columns, int(right // cell) + 1)
+        last_row = min(vegetation.rows, int(bottom // cell) + 1)
+        if first_column >= last_column or first_row >= last_row:
+            return
+        density = vegetation.biomass[first_row:last_row, first_column:last_column].T / CAPACITY
+        # Multiplied onto the background: bare ground stays white, full cells take VEGETATION_COLOR
+        tint = 255 - density[:, :, None] * (255 - np.array(VEGETATION_COLOR))
+        surface = pygame.surfarray.make_surface(tint.astype(np.uint8))
+        left, top = camera.to_screen(first_column * cell, first_row * cell)
+        size = (math.ceil((last_column - first_column) * cell * camera.zoom),
+                math.ceil((last_row - first_row) * cell * camera.zoom))
+        screen.blit(pygame.transform.scale(surface, size), (int(left), int(top)), special_flags=pygame.BLEND_RGB_MULT)
+
+    def draw_entities(self, screen: pygame.Surface, xs: Sequence[float], ys: Sequence[float],
+                      sizes: Sequence[float], species: Sequence[Species]):
+        camera = self.camera
+        if camera.zoom < HEATMAP_ZOOM:
+            self.draw_heatmap(screen, xs, ys, species)
+            return
+
+        cx, cy, zoom = camera.x, camera.y, camera.zoom
+        width, height = camera.view_width, camera.view_height
+        sprite = self.sprite
+        blits: List[Tuple[pygame.Surface, Tuple[int, int]]] = []
+        for x, y, size, kind in zip(xs, ys, sizes, species):
+            radius = max(1, int(size * 5 * zoom))
+            sx = int((x - cx) * zoom)
+            sy = int((y - cy) * zoom)
+            # Cull anything whose sprite lies entirely outside the view
+            if sx + radius < 0 or sy + radius < 0 or sx - radius >= width or sy - radius >= height:
+                continue
+            blits.append((sprite(SPECIES_COLORS.get(kind, UNKNOWN_COLOR), radius), (sx - radius, sy - radius)))
+        screen.blits(blits, doreturn=False)
+
+    def draw_heatmap(self, screen: pygame.Surface, xs: Sequence[float], ys: Sequence[float],
+                     species: Sequence[Species]):
+        camera = self.camera
+        columns = math.ceil(camera.view_width / HEATMAP_CELL)
+        rows = math.ceil(camera.view_height / HEATMAP_CELL)
+        scale = camera.zoom / HEATMAP_CELL
+        cells: Dict[Tuple[int, int], Dict[Species, int]] = {}
+        for x, y, kind in zip(xs, ys, species):
+            column = int((x - camera.x) * scale)
+            row = int((y - camera.y) * scale)
+            if 0 <= column < columns and 0 <= row < rows:
+                counts = cells.setdefault((column, row), {})
+                counts[kind] = counts.get(kind, 0) + 1
+        if not cells:
+            return
+
+        densest = max(sum(counts.values()) for counts in cells.values())
+        heatmap = pygame.Surface((columns, rows), pygame.SRCALPHA)
+        for cell, counts in cells.items():
+            # Each cell takes the colour of its most common species, stronger where it is denser
+            kind = max(counts, key=counts.get)
+            alpha = 64 + int(191 * math.log1p(sum(counts.values())) / math.log1p(densest))
+            heatmap.set_at(cell, SPECIES_COLORS.get(kind, UNKNOWN_COLOR) + (alpha,))
+        screen.blit(pygame.transform.scale(heatmap, (columns * HEATMAP_CELL, rows * HEATMAP_CELL)), (0, 0))
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict
+
+from entities import Species
+from environment import Environment
+from events import EventLog
+from profiler import Profiler
+from snapshot import Checkpointer, load, read_header
+from timestep import FixedTimestep
+
+SPECIES_NAMES = {
+    "plants": Species.PLANT,
+    "herbivores": Species.HERBIVORE,
+    "omnivores": Species.OMNIVORE,
+    "carnivores": Species.CARNIVORE,
+}
+
+
+def parse_population(text: str) -> Dict[Species, int]:
+    population = {}
+    for part in filter(None, text.split(",")):
+        name, _, count = part.partition("=")
+        name = name.strip().lower()
+        species = SPECIES_NAMES.get(name) or SPECIES_NAMES.get(name + "s")
+        if species is None:
+            raise argparse.ArgumentTypeError(f"Unknown species: {name}")
+        population[species] = int(float(count))
+    return population
+
+
+def populate(env: Environment, population: Dict[Species, int]):
+    for species, count in population.items():
+        env.add_random_entities(species, count)
+
+
+def population_counts(env: Environment) -> Dict[str, int]:
+    return {name: env.stats.count(species) for name, species in SPECIES_NAMES.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the simulation headless, without pygame")
+    parser.add_argument("--ticks", type=lambda value: int(float(value)), default=10000)
+    parser.add_argument("--seed", default="aaaaaa")
+    parser.add_argument("--population", type=parse_population,
+                        default=parse_population("plants=500,herbivores=200,omnivores=50,carnivores=50"))
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--engine", choices=["object", "numpy", "parallel"], default="object")
+    parser.add_argument("--workers", type=int, help="worker processes for the parallel engine, one per core by default")
+    parser.add_argument("--vegetation", action="store_true",
+                        help="grow plants as a biomass field that grazers eat, instead of as entities")
+    parser.add_argument("--brain", choices=["random", "network"],
+                        help="batched decision making; without it entities think one at a time")
+    parser.add_argument("--report-every", type=int, default=0, help="print progress every N ticks")
+    parser.add_argument("--output", help="write final population counts as JSON to this file")
+    parser.add_argument("--profile", help="write a per-tick phase trace to this .csv or .json file")
+    parser.add_argument("--profile-window", type=int, default=10000, help="ticks kept in the profile trace")
+    parser.add_argument("--events", help="stream births, deaths, feeding and spawns to this event log")
+    parser.add_argument("--checkpoint-dir", help="write periodic snapshots into this directory")
+    parser.add_argument("--checkpoint-every", type=lambda value: int(float(value)), default=10000,
+                        help="ticks between snapshots")
+    parser.add_argument("--checkpoint-keep", type=int, default=3, help="snapshots kept on disk, oldest go first")
+    parser.add_argument("--resume", help="continue from a snapshot file, or the newest one in a checkpoint directory")
+    parser.add_argument("--live", metavar="NAME", help="publish frames for `python viewer.py NAME` to attach to")
+    parser.add_argument("--paced", action="store_true",
+                        help="tick at the simulation speed, 60 ticks/sec at 1.0, instead of flat out")
+    args = parser.parse_args(argv)
+
+    if args.resume:
+        path = Checkpointer(args.resume, 0).latest() if os.path.isdir(args.resume) else args.resume
+        if path is None:
+            parser.error(f"No checkpoints in {args.resume}")
+        # The snapshot's own seed, engine and world size win over the command line
+        env = load(path)
+        args.seed = env.seed
+        args.engine = env.engine.name if env.engine is not None else "object"
+        print(f"resumed from {path} at tick {env.ticks}", file=sys.stderr)
+    else:
+        brain = None
+        if args.brain:
+            from brains import make_brain
+            brain = make_brain(args.brain)
+        env = Environment(args.width, args.height, args.seed, engine=args.engine, brain=brain,
+                          vegetation=args.vegetation, workers=args.workers)
+        populate(env, args.population)
+    if args.profile:
+        env.profiler = Profiler(args.profile_window)
+    if args.events:
+        # A resumed run carries on the log it was writing before, from where it stood at the snapshot
+        offset = read_header(path).get("events_offset") if args.resume else None
+        try:
+            env.events = EventLog(args.events, append=bool(args.resume), offset=offset)
+        except ValueError as error:
+            parser.error(str(error))
+    checkpointer = None
+    if args.checkpoint_dir:
+        checkpointer = Checkpointer(args.checkpoint_dir, args.checkpoint_every, args.checkpoint_keep)
+    publisher = None
+    if args.live:
+        from live import LivePublisher
+        publisher = LivePublisher(args.live)
+        print(f"publishing live frames as {args.live}", file=sys.stderr)
+
+    # --ticks is the length of the whole run, so a resumed run stops where the original would have
+    first = env.ticks
+    start = time.perf_counter()
+
+    def step():
+        if env.ticks >= args.ticks:
+            return
+        env.tick()
+        if checkpointer is not None:
+            checkpointer.update(env)  # flushes the event log and records its length in the snapshot
+        if args.report_every and env.ticks % args.report_every == 0:
+            elapsed = time.perf_counter() - start
+            rate = (env.ticks - first) / elapsed
+            print(f"tick {env.ticks}: {len(env.entities)} entities, {rate:.1f} ticks/sec", file=sys.stderr)
+
+    timestep = FixedTimestep(base_rate=60) if args.paced else None
+    try:
+        while env.ticks < args.ticks:
+            if publisher is not None:
+                # Viewers may pause the run or change its settings; only a paced run follows their speed
+                publisher.update(env, timestep.target_rate if timestep is not None else 0.0)
+                if env.paused:
+                    if timestep is not None:
+                        timestep.reset()
+                    time.sleep(publisher.interval)
+                    continue
+            if timestep is not None:
+                timestep.advance(step, env.simulation_speed)
+                time.sleep(1 / timestep.base_rate)
+            else:
+                step()
+    finally:
+        if publisher is not None:
+            publisher.close()
+    elapsed = time.perf_counter() - start
+    ticks = env.ticks - first
+
+    result = {
+        "seed": args.seed,
+        "engine": args.engine,
+        "ticks": env.ticks,
+        "seconds": elapsed,
+        "ticks_per_sec": ticks / elapsed if elapsed else float("inf"),
+        "population": population_counts(env),
+    }
+    if env.vegetation is not None:
+        result["biomass"] = env.vegetation.total()
+    print(f"{ticks} ticks in {elapsed:.2f}s ({result['ticks_per_sec']:.1f} ticks/sec)")
+    print(", ".join(f"{name}={count}" for name, count in result["population"].items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.profile:
+        env.profiler.export(args.profile)
+    if args.events:
+        env.events.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from typing import Dict, List, Tuple
+
+from entities import Entity, Species
+
+# An entity whose next steps are passive (no thinking that draws from the RNG, no movement, no
+# interaction) is taken out of the tick loop until the tick it next has to act or dies. Its energy
+# and age are replayed step by step when it wakes or is read, with the same float operations the
+# tick loop would have done, so a scheduled run is identical to one that visits everything.
+MAX_AGE = 1000
+HUNGRY = 20  # Entity.think goes looking for food below this energy
+WOUNDED = 50  # and rests below this health
+
+
+def passive(entity: Entity) -> bool:
+    # Plants only age and grow; a wounded animal with enough energy rests without touching the RNG
+    if entity.species == Species.PLANT:
+        return True
+    return entity.health < WOUNDED and entity.energy >= HUNGRY
+
+
+def replay(entity: Entity, steps: int):
+    # The state updates of `steps` passive ticks, exactly as Environment.tick does them
+    energy = entity.energy
+    if entity.species == Species.PLANT:
+        growth = entity.growth_rate
+        for _ in range(steps):
+            energy = max(0.0, energy - 1) + growth
+    else:
+        for _ in range(steps):
+            energy = max(0.0, energy - 1)
+    entity.energy = energy
+    entity.age += steps
+
+
+def next_wake(entity: Entity, tick: int) -> Tuple[int, bool]:
+    # The first tick after `tick` at which a passive entity has to be visited, and whether it dies then.
+    # Health only changes when something eats the entity, and the eater removes it itself.
+    energy, age = entity.energy, entity.age
+    if entity.species == Species.PLANT:
+        growth = entity.growth_rate
+        while True:
+            tick += 1
+            energy = max(0.0, energy - 1) + growth
+            age += 1
+            if energy <= 0 or age > MAX_AGE:
+                return tick, True
+    while True:
+        tick += 1
+        if energy < HUNGRY:
+            return tick, False
+        energy = max(0.0, energy - 1)
+        age += 1
+        if age > MAX_AGE:
+            return tick, True
+
+
+class Scheduler:
+    # A timing wheel keyed by absolute tick; each slot holds the entities due that tick.
+    # Entries are never deleted from a slot: one whose entity was removed or rescheduled is skipped when it comes up.
+    def __init__(self):
+        self.slots: Dict[int, List[Entity]] = {}
+        self.sleeping: Dict[int, Tuple[int, int, bool]] = {}  # entity id -> (tick its state is from, wake tick, dies)
+
+    def __len__(self) -> int:
+        return len(self.sleeping)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity.id in self.sleeping
+
+    def sleep(self, entity: Entity, tick: int):
+        # `tick` is the last tick the entity's state reflects
+        wake, dies = next_wake(entity, tick)
+        self.sleeping[entity.id] = (tick, wake, dies)
+        self.slots.setdefault(wake, []).append(entity)
+
+    def due(self, tick: int) -> List[Tuple[Entity, bool]]:
+        # Entities to visit this tick and whether they die in it. Those that act are caught up to the end
+        # of the previous tick, those that die to the end of this one, as if they had stepped in it.
+        woken = []
+        for entity in self.slots.pop(tick, ()):
+            state = self.sleeping.get(entity.id)
+            if state is None or state[1] != tick:
+                continue
+            since, _, dies = self.sleeping.pop(entity.id)
+            replay(entity, tick - since if dies else tick - 1 - since)
+            woken.append((entity, dies))
+        return woken
+
+    def sync(self, entity: Entity, tick: int):
+        # Lazily bring a sleeping entity's energy and age up to `tick`; it stays asleep
+        state = self.sleeping.get(entity.id)
+        if state is not None and state[0] < tick:
+            replay(entity, tick - state[0])
+            self.sleeping[entity.id] = (tick, state[1], state[2])
+
+    def forget(self, entity: Entity):
+        self.sleeping.pop(entity.id, None)
+
+    def clear(self):
+        self.slots.clear()
+        self.sleeping.clear()
@@ -1,187 +1,336 @@
-from typing import Tuple
-
-import pygame
-
-from entities import Entity, Species
-from environment import Environment
-from gui import Button, Slider, InputBox
-
-
-class Simulator:
-    def __init__(self, width: int, height: int):
-        self.width = width
-        self.height = height
-        self.env = Environment(width - 300, height)  # Reserve 300 pixels for GUI
-        pygame.init()
-        self.screen = pygame.display.set_mode((width, height))
-        pygame.display.set_caption("Advanced Life Simulator")
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 24)
-
-        # GUI elements
-        self.buttons = [
-            Button(width - 290, 10, 280, 30, "Pause/Resume", (100, 100, 100)),
-            Button(width - 290, 50, 280, 30, "Add Plant", (0, 200, 0)),
-            Button(width - 290, 90, 280, 30, "Add Herbivore", (0, 0, 200)),
-            Button(width - 290, 130, 280, 30, "Add Omnivore", (200, 100, 0)),
-            Button(width - 290, 170, 280, 30, "Add Carnivore", (200, 0, 0)),
-            Button(width - 290, 210, 280, 30, "Toggle Grid", (150, 150, 150)),
-            Button(width - 290, 250, 280, 30, "Reset Simulation", (200, 0, 0)),
-        ]
-        self.sliders = [
-            Slider(width - 290, 300, 280, 20, 0.1, 5.0, 1.0, "Simulation Speed"),
-            Slider(width - 290, 350, 280, 20, 0, 40, 20, "Temperature"),
-            Slider(width - 290, 400, 280, 20, 0, 1, 0.1, "Mutation Rate"),
-        ]
-        self.input_boxes = [
-            InputBox(width - 290, 450, 280, 30, "Seed"),
-        ]
-
-        # Simulation settings
-        self.show_grid = False
-        self.grid_size = 20
-        self.selected_entity = None
-
-    def run(self):
-        running = True
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    self.handle_mouse_click(event.pos)
-                elif event.type == pygame.KEYDOWN:
-                    for box in self.input_boxes:
-                        box.handle_event(event)
-                for slider in self.sliders:
-                    slider.handle_event(event)
-
-            self.update_simulation()
-            self.draw()
-            self.clock.tick(60)  # 60 FPS
-
-        pygame.quit()
-
-    def update_simulation(self):
-        self.env.simulation_speed = self.sliders[0].value
-        self.env.average_temperature = self.sliders[1].value
-        self.env.mutation_rate = self.sliders[2].value
-
-        if not self.env.paused:
-            for _ in range(int(self.env.simulation_speed)):
-                self.env.tick()
-
-    def draw(self):
-        self.screen.fill((255, 255, 255))  # White background
-
-        if self.show_grid:
-            self.draw_grid()
-
-        # Draw entities
-        for entity in self.env.entities:
-            color = self.get_entity_color(entity)
-            pygame.draw.circle(self.screen, color,
-                               (int(entity.location.x), int(entity.location.y)),
-                               int(entity.size * 5))
-
-            # Highlight selected entity
-            if entity == self.selected_entity:
-                pygame.draw.circle(self.screen, (255, 255, 0),
-                                   (int(entity.location.x), int(entity.location.y)),
-                                   int(entity.size * 5) + 2, 2)
-
-        # Draw GUI elements
-        for button in self.buttons:
-            button.draw(self.screen, self.font)
-        for slider in self.sliders:
-            slider.draw(self.screen, self.font)
-        for box in self.input_boxes:
-            box.draw(self.screen)
-
-        # Display stats
-        self.draw_stats()
-
-        # Display selected entity info
-        if self.selected_entity:
-            self.draw_entity_info()
-
-        pygame.display.flip()
-
-    def draw_grid(self):
-        for x in range(0, self.env.width, self.grid_size):
-            pygame.draw.line(self.screen, (200, 200, 200), (x, 0), (x, self.env.height))
-        for y in range(0, self.env.height, self.grid_size):
-            pygame.draw.line(self.screen, (200, 200, 200), (0, y), (self.env.width, y))
-
-    def draw_stats(self):
-        stats = [
-            f"Entities: {len(self.env.entities)}",
-            f"Temperature: {self.env.temperature:.1f}",
-            f"Time: {'Night' if self.env.night else 'Day'}",
-            f"Plants: {sum(1 for e in self.env.entities if e.species == Species.PLANT)}",
-            f"Herbivores: {sum(1 for e in self.env.entities if e.species == Species.HERBIVORE)}",
-            f"Omnivores: {sum(1 for e in self.env.entities if e.species == Species.OMNIVORE)}",
-            f"Carnivores: {sum(1 for e in self.env.entities if e.species == Species.CARNIVORE)}",
-        ]
-        for i, stat in enumerate(stats):
-            text_surface = self.font.render(stat, True, (0, 0, 0))
-            self.screen.blit(text_surface, (self.env.width + 10, 500 + i * 30))
-
-    def draw_entity_info(self):
-        info = [
-            f"Species: {self.selected_entity.species.name}",
-            f"Health: {self.selected_entity.health:.1f}",
-            f"Energy: {self.selected_entity.energy:.1f}",
-            f"Age: {self.selected_entity.age}",
-            f"Size: {self.selected_entity.size:.2f}",
-            f"Diet: {self.selected_entity.diet:.2f}",
-            f"Task: {self.selected_entity.task.name}",
-        ]
-        for i, line in enumerate(info):
-            text_surface = self.font.render(line, True, (0, 0, 0))
-            self.screen.blit(text_surface, (10, 10 + i * 25))
-
-    def handle_mouse_click(self, pos: Tuple[int, int]):
-        for button in self.buttons:
-            if button.is_clicked(pos):
-                self.handle_button_click(button.text)
-                return
-
-        # Check if an entity was clicked
-        for entity in self.env.entities:
-            distance = ((entity.location.x - pos[0]) ** 2 + (entity.location.y - pos[1]) ** 2) ** 0.5
-            if distance <= entity.size * 5:
-                self.selected_entity = entity
-                return
-
-        # If no entity was clicked, deselect
-        self.selected_entity = None
-
-    def handle_button_click(self, button_text: str):
-        if button_text == "Pause/Resume":
-            self.env.paused = not self.env.paused
-        elif button_text == "Add Plant":
-            self.env.add_random_entity(Species.PLANT)
-        elif button_text == "Add Herbivore":
-            self.env.add_random_entity(Species.HERBIVORE)
-        elif button_text == "Add Omnivore":
-            self.env.add_random_entity(Species.OMNIVORE)
-        elif button_text == "Add Carnivore":
-            self.env.add_random_entity(Species.CARNIVORE)
-        elif button_text == "Toggle Grid":
-            self.show_grid = not self.show_grid
-        elif button_text == "Reset Simulation":
-            seed = self.input_boxes[0].text or None
-            self.env = Environment(self.width - 300, self.height, seed)
-
-    @staticmethod
-    def get_entity_color(entity: Entity) -> Tuple[int, int, int]:
-        if entity.species == Species.PLANT:
-            return (0, 255, 0)  # Green
-        elif entity.species == Species.HERBIVORE:
-            return (0, 0, 255)  # Blue
-        elif entity.species == Species.OMNIVORE:
-            return (255, 165, 0)  # Orange
-        elif entity.species == Species.CARNIVORE:
-            return (255, 0, 0)  # Red
-        return (128, 128, 128)  # Gray for unknown species
+from typing import Optional, Tuple
+
+import pygame
+
+from entities import Entity, Species
+from environment import Environment
+from gui import Button, Slider, InputBox, TextCache
+from profiler import Profiler
+from render import Camera, WorldRenderer, SPECIES_COLORS, UNKNOWN_COLOR
+from snapshot import save, load
+from timestep import FixedTimestep
+
+QUICKSAVE_PATH = "quicksave.snap"
+
+
+class Simulator:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.view_width = width - 300  # Reserve 300 pixels for GUI
+        self.env = Environment(self.view_width, height)
+        pygame.init()
+        self.screen = pygame.display.set_mode((width, height))
+        pygame.display.set_caption("Advanced Life Simulator")
+        self.clock = pygame.time.Clock()
+        self.font = pygame.font.Font(None, 24)
+        self.text_cache = TextCache(self.font)
+        self.camera = Camera(self.view_width, height)
+        self.renderer = WorldRenderer(self.camera)
+        self.panning = False
+
+        # GUI elements
+        self.buttons = [
+            Button(width - 290, 10, 280, 30, "Pause/Resume", (100, 100, 100)),
+            Button(width - 290, 50, 280, 30, "Add Plant", (0, 200, 0)),
+            Button(width - 290, 90, 280, 30, "Add Herbivore", (0, 0, 200)),
+            Button(width - 290, 130, 280, 30, "Add Omnivore", (200, 100, 0)),
+            Button(width - 290, 170, 280, 30, "Add Carnivore", (200, 0, 0)),
+            Button(width - 290, 210, 280, 30, "Toggle Grid", (150, 150, 150)),
+            Button(width - 290, 250, 280, 30, "Reset Simulation", (200, 0, 0)),
+        ]
+        self.sliders = [
+            Slider(width - 290, 300, 280, 20, 0.1, 5.0, 1.0, "Simulation Speed"),
+            Slider(width - 290, 350, 280, 20, 0, 40, 20, "Temperature"),
+            Slider(width - 290, 400, 280, 20, 0, 1, 0.1, "Mutation Rate"),
+        ]
+        self.input_boxes = [
+            InputBox(width - 290, 450, 280, 30, "Seed"),
+        ]
+
+        # Simulation settings
+        self.show_grid = False
+        self.grid_size = 20
+        self.selected_entity_id: Optional[int] = None
+        self.timestep = FixedTimestep(base_rate=60)  # speed 1.0 is one tick per frame at 60 FPS
+        self.profiler: Optional[Profiler] = None  # toggled with F3
+        self.show_history = False  # toggled with F4
+        self.vegetation = False  # toggled with F6, which starts a new simulation
+
+    @property
+    def selected_entity(self) -> Optional[Entity]:
+        if self.selected_entity_id is None:
+            return None
+        return self.env.get_entity(self.selected_entity_id)
+
+    def run(self):
+        running = True
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    self.handle_mouse_click(event.pos)
+                elif event.type == pygame.KEYDOWN:
+                    self.handle_key(event.key)
+                    for box in self.input_boxes:
+                        box.handle_event(event)
+                self.handle_camera_event(event)
+                for slider in self.sliders:
+                    slider.handle_event(event)
+
+            self.update_simulation()
+            self.draw()
+            self.clock.tick(60)  # 60 FPS
+
+        pygame.quit()
+
+    def handle_key(self, key: int):
+        if key == pygame.K_F3:
+            self.toggle_profiler()
+        elif key == pygame.K_F4:
+            self.show_history = not self.show_history
+        elif key == pygame.K_F6:
+            self.vegetation = not self.vegetation
+            self.reset()
+        elif key == pygame.K_F5:
+            save(self.env, QUICKSAVE_PATH)
+        elif key == pygame.K_F9:
+            self.quickload()
+
+    def update_simulation(self):
+        self.env.simulation_speed = self.sliders[0].value
+        self.env.average_temperature = self.sliders[1].value
+        self.env.mutation_rate = self.sliders[2].value
+
+        if self.env.paused:
+            self.timestep.reset()
+        else:
+            self.timestep.advance(self.env.tick, self.env.simulation_speed)
+
+    def handle_camera_event(self, event: pygame.event.Event):
+        if event.type == pygame.MOUSEWHEEL:
+            pos = pygame.mouse.get_pos()
+            if self.camera.contains(*pos):
+                self.camera.zoom_at(1.2 ** event.y, *pos)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (2, 3):
+            self.panning = self.camera.contains(*event.pos)
+        elif event.type == pygame.MOUSEBUTTONUP and event.button in (2, 3):
+            self.panning = False
+        elif event.type == pygame.MOUSEMOTION and self.panning:
+            self.camera.pan(*event.rel)
+        elif event.type == pygame.KEYDOWN and not any(box.active for box in self.input_boxes):
+            step = 50
+            if event.key == pygame.K_LEFT:
+                self.camera.pan(step, 0)
+            elif event.key == pygame.K_RIGHT:
+                self.camera.pan(-step, 0)
+            elif event.key == pygame.K_UP:
+                self.camera.pan(0, step)
+            elif event.key == pygame.K_DOWN:
+                self.camera.pan(0, -step)
+            elif event.key == pygame.K_HOME:
+                self.camera.reset()
+
+    def quickload(self):
+        try:
+            env = load(QUICKSAVE_PATH)
+        except (OSError, ValueError):
+            return
+        self.replace_environment(env)
+        self.sliders[0].value = env.simulation_speed
+        self.sliders[1].value = env.average_temperature
+        self.sliders[2].value = env.mutation_rate
+
+    def reset(self):
+        seed = self.input_boxes[0].text or None
+        self.replace_environment(Environment(self.view_width, self.height, seed, vegetation=self.vegetation))
+
+    def replace_environment(self, env: Environment):
+        self.env = env
+        self.env.profiler = self.profiler
+        self.selected_entity_id = None
+        self.timestep.reset()
+
+    def toggle_profiler(self):
+        self.profiler = Profiler() if self.profiler is None else None
+        self.env.profiler = self.profiler
+
+    def draw(self):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin()
+
+        self.screen.fill((255, 255, 255))  # White background
+
+        # Draw the world, clipped to the view so nothing spills under the GUI panel
+        self.screen.set_clip(pygame.Rect(0, 0, self.view_width, self.height))
+        self.renderer.draw_background(self.screen, (self.env.width, self.env.height), self.show_grid,
+                                      self.grid_size)
+        if self.env.vegetation is not None:
+            self.renderer.draw_vegetation(self.screen, self.env.vegetation)
+        self.renderer.draw_entities(self.screen, *self.env.frame())
+
+        # Highlight selected entity
+        selected = self.selected_entity
+        if selected is not None:
+            sx, sy = self.camera.to_screen(selected.location.x, selected.location.y)
+            pygame.draw.circle(self.screen, (255, 255, 0), (int(sx), int(sy)),
+                               int(selected.size * 5 * self.camera.zoom) + 2, 2)
+        self.screen.set_clip(None)
+        if profiler is not None:
+            profiler.lap("world")
+            profiler.count("entities", len(self.env.entities))
+
+        # Draw GUI elements
+        for button in self.buttons:
+            button.draw(self.screen, self.font)
+        for slider in self.sliders:
+            slider.draw(self.screen, self.font)
+        for box in self.input_boxes:
+            box.draw(self.screen)
+        if profiler is not None:
+            profiler.lap("gui")
+
+        # Display stats
+        self.draw_stats()
+
+        # Display selected entity info
+        if selected is not None:
+            self.draw_entity_info(selected)
+        if self.show_history:
+            self.draw_history()
+        if profiler is not None:
+            profiler.lap("stats")
+            self.draw_profiler()
+            profiler.lap("overlay")
+
+        pygame.display.flip()
+        if profiler is not None:
+            profiler.lap("flip")
+            profiler.end("frame")
+
+    def draw_profiler(self):
+        lines = []
+        for kind in ("tick", "frame"):
+            summary = self.profiler.summary(kind)
+            if not summary:
+                continue
+            lines.append(f"{kind}: {summary.pop('total_ms'):.2f} ms")
+            for key, value in summary.items():
+                if key.endswith("_ms"):
+                    lines.append(f"  {key[:-3]}: {value:.2f} ms")
+                else:
+                    lines.append(f"  {key}: {value:.0f}")
+
+        # Translucent box in the corner of the world view, next to the stats
+        line_height = 18
+        box = pygame.Surface((230, len(lines) * line_height + 10), pygame.SRCALPHA)
+        box.fill((0, 0, 0, 160))
+        for i, line in enumerate(lines):
+            box.blit(self.text_cache.render(line, (255, 255, 255)), (5, 5 + i * line_height))
+        self.screen.blit(box, (self.view_width - box.get_width() - 5, self.height - box.get_height() - 5))
+
+    def draw_stats(self):
+        achieved, target = self.tick_rates()
+        stats = [
+            f"Entities: {len(self.env.entities)}",
+            f"Temperature: {self.env.temperature:.1f}",
+            f"TPS: {achieved:.0f}/{target:.0f}",
+            f"Time: {'Night' if self.env.night else 'Day'}",
+            f"Plants: {self.env.stats.count(Species.PLANT)}" if self.env.vegetation is None
+            else f"Biomass: {self.env.vegetation.total():.0f}",
+            f"Herbivores: {self.env.stats.count(Species.HERBIVORE)}",
+            f"Omnivores: {self.env.stats.count(Species.OMNIVORE)}",
+            f"Carnivores: {self.env.stats.count(Species.CARNIVORE)}",
+        ]
+        # Two columns so every line fits below the input box
+        for i, stat in enumerate(stats):
+            text_surface = self.text_cache.render(stat, (0, 0, 0))
+            self.screen.blit(text_surface, (self.view_width + 10 + (i % 2) * 145, 500 + (i // 2) * 25))
+
+    def tick_rates(self) -> Tuple[float, float]:
+        # Achieved and target ticks per second
+        return self.timestep.achieved_rate, self.timestep.target_rate
+
+    def draw_history(self):
+        # Population and mean size per species over time, read from the sampled statistics only
+        history = self.env.stats.history
+        width, height = 260, 90
+        panel = pygame.Surface((width + 10, height * 2 + 40), pygame.SRCALPHA)
+        panel.fill((255, 255, 255, 210))
+        pygame.draw.rect(panel, (120, 120, 120), panel.get_rect(), 1)
+        panel.blit(self.text_cache.render("Population", (0, 0, 0)), (5, 2))
+        panel.blit(self.text_cache.render("Mean size", (0, 0, 0)), (5, height + 20))
+        if len(history) >= 2:
+            step = width / (len(history) - 1)
+            highest_count = max(max(sample["counts"].values()) for sample in history) or 1
+            highest_size = max(max(means["size"] for means in sample["means"].values()) for sample in history) or 1
+            for species in Species:
+                color = self.get_color(species)
+                counts = [(5 + i * step, 18 + height - sample["counts"][species.name] / highest_count * height)
+                          for i, sample in enumerate(history)]
+                sizes = [(5 + i * step, 36 + 2 * height - sample["means"][species.name]["size"] / highest_size * height)
+                         for i, sample in enumerate(history)]
+                pygame.draw.lines(panel, color, False, counts)
+                pygame.draw.lines(panel, color, False, sizes)
+        self.screen.blit(panel, (self.view_width - panel.get_width() - 5, 5))
+
+    def draw_entity_info(self, entity: Entity):
+        info = [
+            f"Species: {entity.species.name}",
+            f"Health: {entity.health:.1f}",
+            f"Energy: {entity.energy:.1f}",
+            f"Age: {entity.age}",
+            f"Size: {entity.size:.2f}",
+            f"Diet: {entity.diet:.2f}",
+            f"Task: {entity.task.name}",
+        ]
+        for i, line in enumerate(info):
+            text_surface = self.text_cache.render(line, (0, 0, 0))
+            self.screen.blit(text_surface, (10, 10 + i * 25))
+
+    def handle_mouse_click(self, pos: Tuple[int, int]):
+        for button in self.buttons:
+            if button.is_clicked(pos):
+                self.handle_button_click(button.text)
+                return
+
+        # Check if an entity was clicked
+        if self.camera.contains(*pos):
+            self.pick_entity(pos)
+
+    def pick_entity(self, pos: Tuple[int, int]):
+        x, y = self.camera.to_world(*pos)
+        for entity in self.env.entities:
+            distance = ((entity.location.x - x) ** 2 + (entity.location.y - y) ** 2) ** 0.5
+            if distance <= entity.size * 5:
+                self.selected_entity_id = entity.id
+                return
+
+        # If no entity was clicked, deselect
+        self.selected_entity_id = None
+
+    def handle_button_click(self, button_text: str):
+        if button_text == "Pause/Resume":
+            self.env.paused = not self.env.paused
+        elif button_text == "Add Plant":
+            self.env.add_random_entity(Species.PLANT)
+        elif button_text == "Add Herbivore":
+            self.env.add_random_entity(Species.HERBIVORE)
+        elif button_text == "Add Omnivore":
+            self.env.add_random_entity(Species.OMNIVORE)
+        elif button_text == "Add Carnivore":
+            self.env.add_random_entity(Species.CARNIVORE)
+        elif button_text == "Toggle Grid":
+            self.show_grid = not self.show_grid
+        elif button_text == "Reset Simulation":
+            self.reset()
+
+    @staticmethod
+    def get_entity_color(entity: Entity) -> Tuple[int, int, int]:
+        return Simulator.get_color(entity.species)
+
+    @staticmethod
+    def get_color(species: Species) -> Tuple[int, int, int]:
+        return SPECIES_COLORS.get(species, UNKNOWN_COLOR)
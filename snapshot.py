@@ -0,0 +1,312 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from entities import Entity, Species, Sex, DamageType, TaskType, DNA, Coordinate, GENE_SCHEMA
+from environment import Environment
+
+# File layout: fixed header, JSON metadata, then one contiguous little-endian block per column.
+# Column offsets are relative to the first block and every block starts on an ALIGN boundary,
+# so a reader can map the file and view each column in place.
+MAGIC = b"SIMPSNAP"
+VERSION = 1
+HEADER = struct.Struct("<8sII")  # magic, version, metadata length
+ALIGN = 64
+
+SPECIES = list(Species)
+SEXES = list(Sex)
+DAMAGE_TYPES = list(DamageType)
+TASKS = list(TaskType)
+GENE_WIDTH = len(GENE_SCHEMA[Species.PLANT])
+NUMPY_TYPES = {"i8": "q", "f8": "d", "i1": "b"}
+
+# Environment attributes stored as-is in the metadata
+SETTINGS = ("width", "height", "seed", "average_temperature", "temperature", "time", "night", "ticks",
+            "next_id", "paused", "simulation_speed", "mutation_rate")
+
+
+def align(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def object_columns(env: Environment) -> Dict[str, Tuple[array, Tuple[int, ...]]]:
+    env.sync()
+    entities = env.entities
+    genes = array("d")
+    for entity in entities:
+        genes.extend(entity.dna.values)
+    columns = {
+        "id": array("q", [e.id for e in entities]),
+        "x": array("d", [e.location.x for e in entities]),
+        "y": array("d", [e.location.y for e in entities]),
+        "energy": array("d", [e.energy for e in entities]),
+        "health": array("d", [e.health for e in entities]),
+        "age": array("q", [e.age for e in entities]),
+        "species": array("b", [e.species.value for e in entities]),
+        "sex": array("b", [e.sex.value if e.sex else 0 for e in entities]),
+        "damage_type": array("b", [e.damage_type.value if e.damage_type else 0 for e in entities]),
+        "task": array("b", [e.task.value for e in entities]),
+        "body_temp": array("d", [e.body_temp for e in entities]),
+    }
+    shapes = {name: (len(entities),) for name in columns}
+    columns["genes"] = genes
+    shapes["genes"] = (len(entities), GENE_WIDTH)
+    if env.brain is not None and env.brain.weights:
+        weights = array("d")
+        for entity in entities:
+            weights.extend(entity.dna.weights)
+        columns["weights"] = weights
+        shapes["weights"] = (len(entities), env.brain.weights)
+    return {name: (column, shapes[name]) for name, column in columns.items()}
+
+
+def engine_columns(env: Environment) -> Dict[str, Tuple[Any, Tuple[int, ...]]]:
+    engine = env.engine
+    columns = {name: (column, column.shape) for name, column in engine.columns.items()}
+    columns["genes"] = (engine.genes, engine.genes.shape)
+    if engine.brain.weights:
+        columns["weights"] = (engine.weights, engine.weights.shape)
+    return columns
+
+
+def stats_state(env: Environment) -> Dict:
+    stats = env.stats
+    return {
+        "ticks": stats.ticks,
+        "history": list(stats.history),
+        "species": {species.name: {"count": s.count, "means": s.means, "m2": s.m2, "histograms": s.histograms}
+                    for species, s in stats.species.items()},
+    }
+
+
+def save(env: Environment, path: str):
+    engine = env.engine.name if env.engine is not None else "object"
+    columns = engine_columns(env) if env.engine is not None else object_columns(env)
+    if env.vegetation is not None:
+        columns["biomass"] = (env.vegetation.biomass, env.vegetation.biomass.shape)
+    version, state, gauss = env.random.getstate()
+    meta = {
+        "engine": engine,
+        "brain": env.brain.name if env.brain is not None else None,
+        "vegetation": env.vegetation is not None,
+        "settings": {name: getattr(env, name) for name in SETTINGS},
+        "random": [version, list(state), gauss],
+        "genes": {species.name: list(schema) for species, schema in GENE_SCHEMA.items()},
+        "stats": stats_state(env),
+        "columns": [],
+    }
+    if env.events is not None:
+        # Where the event log stands at this tick, so a run resumed from here can drop what came after
+        meta["events_offset"] = env.events.offset
+    if env.engine is not None:
+        meta["settings"]["next_id"] = env.engine.next_id
+        meta["engine_random"] = env.engine.rng.bit_generator.state
+        if engine == "parallel":
+            meta["workers"] = len(env.engine.workers)  # resumed on as many; any count gives the same run
+    else:
+        meta["grid"] = {"min_cell": env.grid.min_cell, "max_cell": env.grid.max_cell}
+
+    blocks = []
+    offset = 0
+    for name, (column, shape) in columns.items():
+        data = column_bytes(column)
+        meta["columns"].append({"name": name, "type": column_type(column), "shape": list(shape),
+                                "offset": offset, "length": len(data)})
+        blocks.append((offset, data))
+        offset = align(offset + len(data))
+    encoded = json.dumps(meta, separators=(",", ":")).encode()
+
+    # Written next to the target and renamed over it, so a crash never leaves a torn snapshot behind
+    start = align(HEADER.size + len(encoded))
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+        f.write(encoded)
+        for block_offset, data in blocks:
+            f.seek(start + block_offset)
+            f.write(data)
+        f.truncate(start + offset)
+    os.replace(temporary, path)
+
+
+def column_type(column) -> str:
+    # array typecodes, whose sizes are the same on every platform, name the element type of both kinds of column
+    return column.typecode if isinstance(column, array) else NUMPY_TYPES[column.dtype.str[1:]]
+
+
+def column_bytes(column) -> bytes:
+    if isinstance(column, array):
+        if sys.byteorder == "big":
+            column = array(column.typecode, column)
+            column.byteswap()
+        return column.tobytes()
+    return column.astype(column.dtype.newbyteorder("<"), copy=False).tobytes()
+
+
+def read_meta(f) -> Tuple[Dict, int]:
+    magic, version, length = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("Not a snapshot file")
+    if version > VERSION:
+        raise ValueError(f"Snapshot version {version} is newer than supported version {VERSION}")
+    meta = json.loads(f.read(length))
+    return meta, align(HEADER.size + length)
+
+
+def read_header(path: str) -> Dict:
+    with open(path, "rb") as f:
+        return read_meta(f)[0]
+
+
+def load(path: str) -> Environment:
+    with open(path, "rb") as f:
+        meta, start = read_meta(f)
+    saved_genes = {name: tuple(schema) for name, schema in meta["genes"].items()}
+    if saved_genes != {species.name: schema for species, schema in GENE_SCHEMA.items()}:
+        raise ValueError("Snapshot was written with a different gene layout")
+
+    settings = meta["settings"]
+    brain = None
+    if meta.get("brain"):
+        from brains import make_brain
+        brain = make_brain(meta["brain"])
+    env = Environment(settings["width"], settings["height"], settings["seed"], engine=meta["engine"], brain=brain,
+                      vegetation=meta.get("vegetation", False), workers=meta.get("workers"))
+    for name in SETTINGS:
+        setattr(env, name, settings[name])
+    version, state, gauss = meta["random"]
+    env.random.setstate((version, tuple(state), gauss))
+    if env.engine is not None:
+        load_engine(env, path, meta, start)
+    else:
+        load_objects(env, path, meta, start)
+    if env.vegetation is not None:
+        column = next(column for column in meta["columns"] if column["name"] == "biomass")
+        env.vegetation.biomass = map_column(path, start, column)
+    load_stats(env, meta["stats"])
+    return env
+
+
+def map_column(path: str, start: int, column: Dict):
+    import numpy as np
+
+    # Copy-on-write maps: pages are read on first touch and in-place updates stay private to the process
+    shape = tuple(column["shape"])
+    dtype = np.dtype(column["type"]).newbyteorder("<")
+    if not column["length"]:
+        return np.empty(shape, dtype)
+    return np.memmap(path, dtype, "c", start + column["offset"], shape)
+
+
+def load_engine(env: Environment, path: str, meta: Dict, start: int):
+    import numpy as np
+
+    engine = env.engine
+    storage = {column["name"]: map_column(path, start, column) for column in meta["columns"]
+               if column["name"] != "biomass"}
+    if not engine.brain.weights:
+        storage["weights"] = np.empty((len(storage["id"]), 0))
+    # The mapped columns are the buffers until the first birth outgrows them
+    engine.adopt(storage)
+    engine.next_id = meta["settings"]["next_id"]
+    engine.rng.bit_generator.state = meta["engine_random"]
+
+
+def load_objects(env: Environment, path: str, meta: Dict, start: int):
+    columns: Dict[str, array] = {}
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > start:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for column in meta["columns"]:
+                    if column["name"] == "biomass":
+                        continue
+                    offset = start + column["offset"]
+                    data = array(column["type"])
+                    data.frombytes(mapped[offset:offset + column["length"]])
+                    if sys.byteorder == "big":
+                        data.byteswap()
+                    columns[column["name"]] = data
+    if not columns:
+        return
+
+    genes = columns["genes"]
+    weights = columns.get("weights")
+    width = env.brain.weights if weights else 0
+    entities: List[Entity] = []
+    for i, (entity_id, x, y, energy, health, age, species, sex, damage_type, task, body_temp) in enumerate(zip(
+            columns["id"], columns["x"], columns["y"], columns["energy"], columns["health"], columns["age"],
+            columns["species"], columns["sex"], columns["damage_type"], columns["task"], columns["body_temp"])):
+        # Built field by field; Entity() would draw a sex and damage type from the RNG
+        entity = Entity.__new__(Entity)
+        entity.id = entity_id
+        entity.species = SPECIES[species - 1]
+        entity.dna = DNA(genes[i * GENE_WIDTH:(i + 1) * GENE_WIDTH], entity.species,
+                         weights[i * width:(i + 1) * width] if weights else None)
+        entity.sex = SEXES[sex - 1] if sex else None
+        entity.health = health
+        entity.energy = energy
+        entity.age = age
+        entity.damage_type = DAMAGE_TYPES[damage_type - 1] if damage_type else None
+        entity.task = TASKS[task - 1]
+        entity.location = Coordinate(x, y)
+        entity.body_temp = body_temp
+        entities.append(entity)
+
+    env.entities = entities
+    # Everyone gets one ordinary tick before going back to sleep; the tick visits them in id order
+    env.awake = sorted(entities, key=lambda e: e.id)
+    env.entities_by_id = {entity.id: entity for entity in entities}
+    env.positions = {entity.id: i for i, entity in enumerate(entities)}
+    grid = env.grid
+    for entity in entities:
+        grid.insert(entity)
+    # The search bounds cover every cell ever occupied, which the live entities alone don't reproduce
+    grid.min_cell = tuple(meta["grid"]["min_cell"])
+    grid.max_cell = tuple(meta["grid"]["max_cell"])
+
+
+def load_stats(env: Environment, state: Dict):
+    stats = env.stats
+    stats.ticks = state["ticks"]
+    stats.history.extend(state["history"])
+    for species, s in stats.species.items():
+        saved = state["species"][species.name]
+        s.count = saved["count"]
+        s.means = saved["means"]
+        s.m2 = saved["m2"]
+        s.histograms = saved["histograms"]
+
+
+class Checkpointer:
+    # Saves a snapshot every `every` ticks into `directory`, keeping only the newest `keep` files
+    def __init__(self, directory: str, every: int, keep: int = 3):
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, ticks: int) -> str:
+        return os.path.join(self.directory, f"checkpoint-{ticks:012d}.snap")
+
+    def checkpoints(self) -> List[str]:
+        # Zero-padded tick numbers sort in order
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith("checkpoint-") and name.endswith(".snap"))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def latest(self) -> Optional[str]:
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if checkpoints else None
+
+    def update(self, env: Environment) -> Optional[str]:
+        if not self.every or env.ticks % self.every:
+            return None
+        path = self.path(env.ticks)
+        save(env, path)
+        for old in self.checkpoints()[:-self.keep] if self.keep > 0 else ():
+            os.remove(old)
+        return path
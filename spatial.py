@@ -0,0 +1,114 @@
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+from entities import Entity, Sex, Species
+
+Cell = Tuple[int, int]
+
+
+class SpatialGrid:
+    def __init__(self, cell_size: float = 32):
+        self.cell_size = cell_size
+        self.cells: Dict[Species, Dict[Cell, Dict[Entity, int]]] = {species: {} for species in Species}
+        self.counts: Dict[Species, int] = {species: 0 for species in Species}
+        self.entity_cells: Dict[Entity, Cell] = {}
+        self.scanned = 0  # candidates examined by nearest(), for profiling
+        # Bounding box of every cell that has ever been occupied, used to stop ring searches
+        self.min_cell = (0, 0)
+        self.max_cell = (0, 0)
+
+    def __len__(self) -> int:
+        return len(self.entity_cells)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self.entity_cells
+
+    def cell_of(self, x: float, y: float) -> Cell:
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, entity: Entity):
+        if entity in self.entity_cells:
+            return
+        cell = self.cell_of(entity.location.x, entity.location.y)
+        self.place(entity, cell)
+        self.counts[entity.species] += 1
+
+    def remove(self, entity: Entity):
+        cell = self.entity_cells.pop(entity, None)
+        if cell is None:
+            return
+        bucket = self.cells[entity.species][cell]
+        del bucket[entity]
+        if not bucket:
+            del self.cells[entity.species][cell]
+        self.counts[entity.species] -= 1
+
+    def move(self, entity: Entity):
+        # Most moves stay in their cell, so the cell is only built as a tuple once it changes
+        cx = int(math.floor(entity.location.x / self.cell_size))
+        cy = int(math.floor(entity.location.y / self.cell_size))
+        old_cell = self.entity_cells.get(entity)
+        if old_cell is None or (old_cell[0] == cx and old_cell[1] == cy):
+            return
+        cell = cx, cy
+        bucket = self.cells[entity.species][old_cell]
+        del bucket[entity]
+        if not bucket:
+            del self.cells[entity.species][old_cell]
+        self.place(entity, cell)
+
+    def place(self, entity: Entity, cell: Cell):
+        self.cells[entity.species].setdefault(cell, {})[entity] = entity.id
+        self.entity_cells[entity] = cell
+        self.min_cell = (min(self.min_cell[0], cell[0]), min(self.min_cell[1], cell[1]))
+        self.max_cell = (max(self.max_cell[0], cell[0]), max(self.max_cell[1], cell[1]))
+
+    def nearest(self, x: float, y: float, species: Tuple[Species, ...],
+                exclude_sex: Optional[Sex] = None) -> Optional[Entity]:
+        # `exclude_sex` skips entities of that sex, for finding a partner
+        counts = self.counts
+        remaining = 0
+        for s in species:
+            remaining += counts[s]
+        if not remaining:
+            return None
+
+        cx, cy = self.cell_of(x, y)
+        max_ring = max(cx - self.min_cell[0], self.max_cell[0] - cx,
+                       cy - self.min_cell[1], self.max_cell[1] - cy)
+        best = None
+        # Equally near entities tie-break on the lowest id, whatever order the buckets hold them in
+        best_distance = best_id = math.inf
+        ring = 0
+        while remaining and ring <= max_ring:
+            for cell in self.ring_cells(cx, cy, ring):
+                for s in species:
+                    bucket = self.cells[s].get(cell)
+                    if not bucket:
+                        continue
+                    remaining -= len(bucket)
+                    self.scanned += len(bucket)
+                    for entity, entity_id in bucket.items():
+                        if exclude_sex is not None and entity.sex is exclude_sex:
+                            continue
+                        location = entity.location
+                        distance = math.sqrt((x - location.x) ** 2 + (y - location.y) ** 2)
+                        if distance < best_distance or (distance == best_distance and entity_id < best_id):
+                            best, best_distance, best_id = entity, distance, entity_id
+            # Anything outside the scanned square is at least ring * cell_size away
+            if best_distance < ring * self.cell_size:
+                break
+            ring += 1
+        return best
+
+    @staticmethod
+    def ring_cells(cx: int, cy: int, ring: int) -> Iterable[Cell]:
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
@@ -0,0 +1,114 @@
+import math
+from collections import deque
+from typing import Deque, Dict, List, Sequence, Tuple
+
+from entities import Species, GENE_SCHEMA
+
+HISTOGRAM_BINS = 16
+
+# Histogram range per gene; values outside it land in the edge bins
+GENE_RANGES: Dict[str, Tuple[float, float]] = {
+    "size": (0, 4),
+    "damage": (0, 20),
+    "walking_speed": (0, 10),
+    "sprinting_speed": (0, 20),
+    "blunt_resist": (0, 2),
+    "sharp_resist": (0, 2),
+    "nocturnal": (0, 2),
+    "growth_rate": (0, 1),
+    "diet": (0, 1.5),
+}
+
+# Genes whose per-species means are kept in the time series
+TRACKED_GENES = ("size", "diet", "walking_speed")
+
+
+class SpeciesStats:
+    # Running count plus Welford mean/M2 and a fixed-bin histogram for every gene of one species
+    def __init__(self, species: Species):
+        self.genes = GENE_SCHEMA[species]
+        self.ranges = [GENE_RANGES[gene] for gene in self.genes]
+        self.count = 0
+        self.means = [0.0] * len(self.genes)
+        self.m2 = [0.0] * len(self.genes)
+        self.histograms = [[0] * HISTOGRAM_BINS for _ in self.genes]
+
+    def bin(self, i: int, value: float) -> int:
+        low, high = self.ranges[i]
+        return min(HISTOGRAM_BINS - 1, max(0, int((value - low) / (high - low) * HISTOGRAM_BINS)))
+
+    def add(self, values: Sequence[float]):
+        self.count += 1
+        count = self.count
+        means, m2 = self.means, self.m2
+        for i, value in enumerate(values):
+            delta = value - means[i]
+            means[i] += delta / count
+            m2[i] += delta * (value - means[i])
+            self.histograms[i][self.bin(i, value)] += 1
+
+    def remove(self, values: Sequence[float]):
+        self.count -= 1
+        count = self.count
+        means, m2 = self.means, self.m2
+        for i, value in enumerate(values):
+            self.histograms[i][self.bin(i, value)] -= 1
+            if not count:
+                means[i] = m2[i] = 0.0
+                continue
+            # Welford's update run backwards
+            old_mean = means[i]
+            means[i] = (old_mean * (count + 1) - value) / count
+            m2[i] = max(0.0, m2[i] - (value - means[i]) * (value - old_mean))
+
+
+class PopulationStats:
+    def __init__(self, sample_every: int = 10, history_size: int = 600):
+        self.species = {species: SpeciesStats(species) for species in Species}
+        self.sample_every = sample_every
+        self.ticks = 0
+        self.history: Deque[Dict] = deque(maxlen=history_size)
+
+    def add(self, species: Species, values: Sequence[float]):
+        self.species[species].add(values)
+
+    def remove(self, species: Species, values: Sequence[float]):
+        self.species[species].remove(values)
+
+    def count(self, species: Species) -> int:
+        return self.species[species].count
+
+    def counts(self) -> Dict[Species, int]:
+        return {species: stats.count for species, stats in self.species.items()}
+
+    def mean(self, species: Species, gene: str) -> float:
+        stats = self.species[species]
+        return stats.means[stats.genes.index(gene)] if gene in stats.genes else 0.0
+
+    def variance(self, species: Species, gene: str) -> float:
+        stats = self.species[species]
+        if gene not in stats.genes or stats.count < 2:
+            return 0.0
+        return stats.m2[stats.genes.index(gene)] / (stats.count - 1)
+
+    def std(self, species: Species, gene: str) -> float:
+        return math.sqrt(self.variance(species, gene))
+
+    def histogram(self, species: Species, gene: str) -> Tuple[List[float], List[int]]:
+        stats = self.species[species]
+        if gene not in stats.genes:
+            return [], []
+        low, high = GENE_RANGES[gene]
+        edges = [low + (high - low) * i / HISTOGRAM_BINS for i in range(HISTOGRAM_BINS + 1)]
+        return edges, list(stats.histograms[stats.genes.index(gene)])
+
+    def tick(self):
+        # Every sample_every ticks the counts and tracked means go into the ring buffer
+        self.ticks += 1
+        if self.ticks % self.sample_every == 0:
+            self.history.append({
+                "tick": self.ticks,
+                "counts": {species.name: stats.count for species, stats in self.species.items()},
+                "means": {species.name: {gene: self.mean(species, gene) for gene in TRACKED_GENES}
+                          for species in self.species},
+            })
@@ -0,0 +1,167 @@
+import math
+import random
+import statistics
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from brains import make_brain
+from entities import Coordinate, DamageType, DNA, Entity, Species, predation
+from environment import Environment
+from numpy_engine import GENE_INDEX
+from parallel_engine import nearby
+
+POPULATION = {Species.PLANT: 400, Species.HERBIVORE: 200, Species.OMNIVORE: 100, Species.CARNIVORE: 100}
+SEEDS = [str(seed) for seed in range(10)]
+CHECKPOINTS = (50, 100)
+
+
+def trajectories(engine: str):
+    # Per seed, the count of every species at each checkpoint
+    runs = []
+    for seed in SEEDS:
+        env = Environment(800, 600, seed, engine=engine)
+        for species, count in POPULATION.items():
+            env.add_random_entities(species, count)
+        counts = []
+        for tick in range(1, max(CHECKPOINTS) + 1):
+            env.tick()
+            if tick in CHECKPOINTS:
+                counts.append({species: env.stats.count(species) for species in Species})
+        runs.append(counts)
+    return runs
+
+
+@pytest.mark.parametrize("engine", ["numpy", "parallel"])
+def test_array_engines_match_object_engine_statistically(engine):
+    # The engines draw from different random streams, so runs only agree in distribution: the mean
+    # population of every species has to fall within a few standard errors of the object engine's
+    objects, arrays = trajectories("object"), trajectories(engine)
+    for index, tick in enumerate(CHECKPOINTS):
+        for species in Species:
+            a = [run[index][species] for run in objects]
+            b = [run[index][species] for run in arrays]
+            error = math.sqrt((statistics.variance(a) + statistics.variance(b)) / len(SEEDS))
+            assert abs(statistics.mean(a) - statistics.mean(b)) <= 4 * error + 2, (tick, species, a, b)
+
+
+def test_numpy_engine_grows_without_disturbing_rows():
+    env = Environment(800, 600, "growth", engine="numpy")
+    env.add_random_entities(Species.HERBIVORE, 10)
+    engine = env.engine
+    before = {name: column.copy() for name, column in engine.columns.items()}
+    genes = engine.genes.copy()
+    for _ in range(3000):
+        env.add_random_entity(Species.PLANT)
+    assert len(env.entities) == 3010
+    assert engine.capacity >= 3010
+    for name, column in before.items():
+        assert np.array_equal(engine.columns[name][:10], column)
+    assert np.array_equal(engine.genes[:10], genes)
+    assert np.all(np.diff(engine.columns["id"]) > 0)
+
+
+@pytest.mark.parametrize("engine", ["numpy", "parallel"])
+def test_array_engines_spawn_empty_populations(engine):
+    env = Environment(800, 600, "empty", engine=engine)
+    assert len(env.engine.spawn(Species.PLANT, 0)) == 0
+    env.add_random_entities(Species.PLANT, 0)
+    env.add_random_entities(Species.HERBIVORE, 10)
+    env.tick()
+    assert 0 < env.stats.count(Species.HERBIVORE) <= 10
+
+
+# Blow and meal of each (hunter, prey) pair that can meet, worked out by hand from the genes below
+GENOMES = {
+    Species.PLANT: ({"size": 2.0, "growth_rate": 0.3}, None),
+    Species.HERBIVORE: ({"size": 1.0, "damage": 2, "blunt_resist": 0.3, "sharp_resist": 0.6, "diet": 0.1},
+                        DamageType.BLUNT),
+    Species.OMNIVORE: ({"size": 1.2, "damage": 4, "blunt_resist": 0.5, "sharp_resist": 0.25, "diet": 0.5},
+                       DamageType.BLUNT),
+    Species.CARNIVORE: ({"size": 1.5, "damage": 8, "blunt_resist": 0.2, "sharp_resist": 0.4, "diet": 0.9},
+                        DamageType.SHARP),
+}
+CONTACTS = {
+    (Species.CARNIVORE, Species.HERBIVORE): (8 * (1 - 0.6), 1.0 * 10 * (1 - 0.8)),
+    (Species.CARNIVORE, Species.OMNIVORE): (8 * (1 - 0.25), 1.2 * 10 * (1 - 0.4)),
+    (Species.OMNIVORE, Species.HERBIVORE): (4 * (1 - 0.3), 1.0 * 10 * (1 - 0.4)),
+    (Species.OMNIVORE, Species.PLANT): (0.0, 2.0 * 10 * (1 - 0.5)),
+    (Species.HERBIVORE, Species.PLANT): (0.0, 2.0 * 10 * (1 - 0.1)),
+}
+
+
+def test_predation_blows_and_meals():
+    entities = {}
+    for species, (genes, damage_type) in GENOMES.items():
+        entity = Entity(DNA.from_genes(genes, species), Coordinate(0, 0), random.Random(0))
+        entity.damage_type = damage_type
+        entities[species] = entity
+    blows, meals = predation([(entities[hunter], entities[prey]) for hunter, prey in CONTACTS])
+    assert blows == pytest.approx([blow for blow, _ in CONTACTS.values()])
+    assert meals == pytest.approx([meal for _, meal in CONTACTS.values()])
+
+    # The numpy engine's kernel gives the same for the same entities
+    env = Environment(800, 600, "predation", engine="numpy")
+    for entity in entities.values():
+        env.add_entity(entity)
+    row = {species: index for index, species in enumerate(entities)}
+    hunters = np.array([row[hunter] for hunter, _ in CONTACTS])
+    prey = np.array([row[food] for _, food in CONTACTS])
+    gain, blow = env.engine.interact(hunters, prey)
+    assert blow.tolist() == pytest.approx(blows)
+    assert gain.tolist() == pytest.approx(meals)
+
+
+def parallel_run(workers: int, brain, vegetation: bool):
+    env = Environment(800, 600, "workers", engine="parallel", workers=workers, brain=make_brain(brain),
+                      vegetation=vegetation)
+    for species, count in POPULATION.items():
+        env.add_random_entities(species, count)
+    for _ in range(80):
+        env.tick()
+    engine = env.engine
+    run = ({name: column.tolist() for name, column in engine.columns.items()}, engine.genes.tolist(),
+           engine.weights.tolist(), env.stats.history)
+    engine.close()
+    return run
+
+
+@pytest.mark.parametrize("brain, vegetation", [(None, False), ("network", True)])
+def test_parallel_run_does_not_depend_on_worker_count(brain, vegetation):
+    one, two = parallel_run(1, brain, vegetation), parallel_run(2, brain, vegetation)
+    # Compared piece by piece, as a mismatch in the whole would take pytest minutes to diff
+    assert [a == b for a, b in zip(one, two)] == [True] * len(one)
+
+
+def test_halo_search_across_a_strip_boundary_matches_full_search():
+    # Half the population crowds a cut at x = 400, so many catches and matings reach across it; a strip's
+    # search among the rows within reach has to find the same as the numpy engine searching every row
+    env = Environment(800, 600, "halo", engine="numpy")
+    for species, count in POPULATION.items():
+        env.add_random_entities(species, count)
+    engine = env.engine
+    c = engine.columns
+    crowd = np.arange(len(engine)) % 2 == 0
+    c["x"][crowd] = np.random.default_rng(0).uniform(385, 415, crowd.sum())
+    c["y"][crowd] = np.random.default_rng(1).uniform(0, 60, crowd.sum())
+    reach = 2 * engine.genes[:, GENE_INDEX["size"]].max()
+    animals = np.flatnonzero(c["species"] != Species.PLANT.value)
+    crossed = 0
+    for strip in (c["x"][animals] < 400, c["x"][animals] >= 400):
+        rows = animals[strip]
+        halo = nearby(engine, rows, reach)
+        assert not halo.all()
+        full, found = engine.hunt(rows), engine.hunt(rows, halo)
+        assert all(np.array_equal(a, b) for a, b in zip(full, found))
+        hunters, prey = full[0], full[1]
+        crossed += np.count_nonzero((c["x"][hunters] < 400) != (c["x"][prey] < 400))
+        engine.rng = np.random.default_rng(2)
+        full = engine.reproduce(rows)
+        engine.rng = np.random.default_rng(2)
+        found = engine.reproduce(rows, halo)
+        assert all(np.array_equal(a, b) for a, b in zip(full[1:], found[1:]))
+        assert all(np.array_equal(full[0][name], found[0][name]) for name in full[0])
+        initiators, partners = full[3], full[4]
+        crossed += np.count_nonzero((c["x"][initiators] < 400) != (c["x"][partners] < 400))
+    assert crossed
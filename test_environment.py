@@ -0,0 +1,44 @@
+import random
+
+from entities import Species
+from environment import Environment
+
+POPULATION = {Species.PLANT: 300, Species.HERBIVORE: 150, Species.OMNIVORE: 60, Species.CARNIVORE: 60}
+
+
+def check_bookkeeping(env: Environment):
+    # entities, the id and position maps, the awake list, the scheduler and the grid all describe the same
+    # population, however many swap-removes have reordered entities
+    ids = [entity.id for entity in env.entities]
+    assert len(set(ids)) == len(ids)
+    assert env.entities_by_id == {entity.id: entity for entity in env.entities}
+    assert env.positions == {entity.id: index for index, entity in enumerate(env.entities)}
+    awake = [entity.id for entity in env.awake]
+    assert awake == sorted(set(awake))
+    assert all(env.entities_by_id.get(entity.id) is entity for entity in env.awake)
+    assert set(awake).isdisjoint(env.scheduler.sleeping)
+    assert set(awake) | set(env.scheduler.sleeping) == set(ids)
+    assert len(env.grid) == len(ids) and all(entity in env.grid for entity in env.entities)
+    assert env.grid.counts == {species: env.stats.count(species) for species in Species}
+
+
+def test_removals_keep_entities_positions_and_awake_consistent():
+    env = Environment(600, 400, "removals")
+    for species, count in POPULATION.items():
+        env.add_random_entities(species, count)
+    rng = random.Random(0)
+    removed_awake = removed_asleep = 0
+    for tick in range(150):
+        env.tick()
+        check_bookkeeping(env)
+        if tick % 10 == 5 and env.entities:
+            # Awake and sleeping entities alike, with one of them listed twice
+            asleep = [env.entities_by_id[entity_id] for entity_id in env.scheduler.sleeping]
+            woken = rng.sample(env.awake, min(5, len(env.awake)))
+            sleeping = rng.sample(asleep, min(5, len(asleep)))
+            removed_awake, removed_asleep = removed_awake + len(woken), removed_asleep + len(sleeping)
+            doomed = woken + sleeping
+            env.remove_entities(doomed + doomed[:1])
+            assert not any(entity.id in env.entities_by_id for entity in doomed)
+            check_bookkeeping(env)
+    assert removed_awake and removed_asleep
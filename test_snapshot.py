@@ -0,0 +1,61 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import snapshot
+from brains import make_brain
+from entities import Species
+from environment import Environment
+
+POPULATION = {Species.PLANT: 300, Species.HERBIVORE: 100, Species.OMNIVORE: 30, Species.CARNIVORE: 30}
+SAVED_AT, TICKS = 60, 120
+
+
+def build(engine: str, brain: str, vegetation: bool) -> Environment:
+    env = Environment(400, 300, "resume", engine=engine, brain=make_brain(brain), vegetation=vegetation)
+    for species, count in POPULATION.items():
+        env.add_random_entities(species, count)
+    return env
+
+
+def state(env: Environment):
+    # Everything the next tick reads, as repr so a value that changed type shows up too
+    if env.engine is None:
+        env.sync()
+        entities = [(e.id, e.location.x, e.location.y, e.energy, e.health, e.age, e.species, e.sex, e.damage_type,
+                     e.task, e.body_temp, e.dna.values.tolist(), e.dna.weights) for e in env.entities]
+        streams = env.random.getstate()
+    else:
+        entities = ({name: column.tolist() for name, column in env.engine.columns.items()},
+                    env.engine.genes.tolist(), env.engine.weights.tolist())
+        streams = (env.random.getstate(), env.engine.rng.bit_generator.state)
+    biomass = env.vegetation.biomass.tolist() if env.vegetation is not None else None
+    parts = {"entities": entities, "streams": streams, "biomass": biomass,
+             "stats": (env.stats.counts(), env.stats.history[-1]),
+             "clock": (env.ticks, env.time, env.temperature, env.night)}
+    return {name: repr(part) for name, part in parts.items()}
+
+
+def differences(a, b):
+    # Only the names of the parts that differ; pytest would take minutes to diff the reprs themselves
+    return [name for name in a if a[name] != b[name]]
+
+
+@pytest.mark.parametrize("engine, brain, vegetation", [
+    ("object", None, False), ("object", "network", True), ("numpy", None, True), ("parallel", None, False),
+])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, engine, brain, vegetation):
+    uninterrupted = build(engine, brain, vegetation)
+    for _ in range(TICKS):
+        uninterrupted.tick()
+
+    interrupted = build(engine, brain, vegetation)
+    for _ in range(SAVED_AT):
+        interrupted.tick()
+    path = str(tmp_path / "resume.snap")
+    snapshot.save(interrupted, path)
+    resumed = snapshot.load(path)
+    assert differences(state(resumed), state(interrupted)) == []
+    for _ in range(TICKS - SAVED_AT):
+        resumed.tick()
+    assert differences(state(resumed), state(uninterrupted)) == []
@@ -0,0 +1,84 @@
+import math
+import random
+
+from entities import DNA, Coordinate, Entity, Sex, Species
+from spatial import SpatialGrid
+
+WIDTH, HEIGHT = 800, 600
+ANIMALS = (Species.HERBIVORE, Species.OMNIVORE, Species.CARNIVORE)
+
+
+def brute_force(entities, x, y, species, exclude_sex=None):
+    # The scan over every entity that the grid replaced: nearest first, the lowest id among equals
+    candidates = [entity for entity in entities if entity.species in species
+                  and (exclude_sex is None or entity.sex is not exclude_sex)]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda e: (math.sqrt((x - e.location.x) ** 2 + (y - e.location.y) ** 2), e.id))
+
+
+def populate(rng: random.Random, count: int):
+    # Positions on a 20 unit lattice, so many candidates are exactly as far away as each other, and ids
+    # shuffled so the lowest id among equals is seldom the first one inserted
+    ids = list(range(count))
+    rng.shuffle(ids)
+    entities = []
+    for entity_id in ids:
+        species = rng.choice(list(Species))
+        location = Coordinate(rng.randrange(0, WIDTH // 20 + 1) * 20.0, rng.randrange(0, HEIGHT // 20 + 1) * 20.0)
+        entity = Entity(DNA.random(species, rng), location, rng)
+        entity.id = entity_id
+        entities.append(entity)
+    return entities
+
+
+def queries(rng: random.Random):
+    # Lattice points for ties, the corners and edges of the world for the outermost rings, and anywhere
+    corners = [(0.0, 0.0), (WIDTH, 0.0), (0.0, HEIGHT), (WIDTH, HEIGHT), (WIDTH / 2, 0.0), (0.0, HEIGHT / 2)]
+    lattice = [(rng.randrange(0, WIDTH // 20 + 1) * 20.0, rng.randrange(0, HEIGHT // 20 + 1) * 20.0)
+               for _ in range(100)]
+    anywhere = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)) for _ in range(100)]
+    return corners + lattice + anywhere
+
+
+def check_against_brute_force(grid, entities, rng):
+    for x, y in queries(rng):
+        for species in ((Species.PLANT,), ANIMALS, (Species.CARNIVORE,), (Species.PLANT, Species.HERBIVORE)):
+            assert grid.nearest(x, y, species) is brute_force(entities, x, y, species), (x, y, species)
+        for sex in Sex:
+            assert (grid.nearest(x, y, ANIMALS, exclude_sex=sex)
+                    is brute_force(entities, x, y, ANIMALS, exclude_sex=sex)), (x, y, sex)
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(0)
+    entities = populate(rng, 400)
+    grid = SpatialGrid()
+    for entity in entities:
+        grid.insert(entity)
+    check_against_brute_force(grid, entities, rng)
+
+    # After moves, some onto the world's edges, and removals
+    for entity in rng.sample(entities, 150):
+        entity.location.x = rng.choice((0.0, float(WIDTH), rng.uniform(0, WIDTH)))
+        entity.location.y = rng.choice((0.0, float(HEIGHT), rng.uniform(0, HEIGHT)))
+        grid.move(entity)
+    for entity in rng.sample(entities, 150):
+        grid.remove(entity)
+        entities.remove(entity)
+    check_against_brute_force(grid, entities, rng)
+
+
+def test_nearest_searches_out_to_the_far_corner():
+    # A lone candidate in the opposite corner is only reached by the last ring the search allows
+    rng = random.Random(1)
+    grid = SpatialGrid()
+    far = Entity(DNA.random(Species.PLANT, rng), Coordinate(WIDTH, HEIGHT), rng)
+    far.id = 0
+    near = Entity(DNA.random(Species.HERBIVORE, rng), Coordinate(0.0, 0.0), rng)
+    near.id = 1
+    grid.insert(far)
+    grid.insert(near)
+    assert grid.nearest(0.0, 0.0, (Species.PLANT,)) is far
+    assert grid.nearest(WIDTH, HEIGHT, (Species.HERBIVORE,)) is near
+    assert grid.nearest(0.0, 0.0, (Species.CARNIVORE,)) is None
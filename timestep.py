@@ -0,0 +1,56 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+# Longer gaps between frames (window drags, breakpoints) are treated as this long
+MAX_FRAME_TIME = 0.25
+
+
+class FixedTimestep:
+    def __init__(self, base_rate: float = 60.0, budget: float = 0.012, window: float = 1.0,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.base_rate = base_rate  # ticks per second at speed 1.0
+        self.budget = budget  # seconds of simulation allowed per frame
+        self.window = window
+        self.clock = clock
+        self.accumulator = 0.0
+        self.last_time: Optional[float] = None
+        self.history: Deque[Tuple[float, int]] = deque()
+        self.target_rate = 0.0
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.last_time = None
+        self.history.clear()
+
+    def advance(self, step: Callable[[], None], speed: float) -> int:
+        now = self.clock()
+        elapsed = min(now - self.last_time, MAX_FRAME_TIME) if self.last_time is not None else 0.0
+        self.last_time = now
+        self.target_rate = speed * self.base_rate
+        # Fractional ticks carry over, so a speed of 0.5 ticks every other frame at the base rate
+        self.accumulator += elapsed * self.target_rate
+
+        ticks = 0
+        deadline = now + self.budget
+        while self.accumulator >= 1:
+            step()
+            self.accumulator -= 1
+            ticks += 1
+            if self.clock() >= deadline:
+                # Drop the backlog that didn't fit so one slow frame can't snowball into the next
+                self.accumulator -= int(self.accumulator)
+                break
+
+        self.history.append((now, ticks))
+        while self.history and self.history[0][0] < now - self.window:
+            self.history.popleft()
+        return ticks
+
+    @property
+    def achieved_rate(self) -> float:
+        if len(self.history) < 2:
+            return 0.0
+        span = self.history[-1][0] - self.history[0][0]
+        # The first entry's ticks ran before the span starts
+        return sum(ticks for _, ticks in list(self.history)[1:]) / span if span > 0 else 0.0
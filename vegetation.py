@@ -0,0 +1,60 @@
+import numpy as np
+
+# Biomass a cell holds when fully grown; the default 500 plants hold about half this per cell of the same world
+CAPACITY = 20.0
+GROWTH_RATE = 0.02  # logistic growth per tick at the ideal temperature
+SEED_RATE = 0.01  # biomass every cell gains per tick, so grazed-out land slowly recovers
+SPREAD_RATE = 0.05  # fraction of the difference to its neighbours a cell takes each tick
+IDEAL_TEMPERATURE = 20.0
+TEMPERATURE_RANGE = 20.0  # growth stops this far from the ideal
+NIGHT_GROWTH = 0.2  # growth multiplier at night
+
+
+class Vegetation:
+    # Plant biomass on a grid of cell_size squares covering the world, updated as whole-field operations
+    def __init__(self, width: float, height: float, seed: int, cell_size: float = 10):
+        self.cell_size = cell_size
+        self.columns = max(1, int(np.ceil(width / cell_size)))
+        self.rows = max(1, int(np.ceil(height / cell_size)))
+        rng = np.random.default_rng(seed)
+        self.biomass = rng.uniform(0.25, 0.75, (self.rows, self.columns)) * CAPACITY
+
+    def update(self, temperature: float, night: bool):
+        b = self.biomass
+        factor = max(0.0, 1 - abs(temperature - IDEAL_TEMPERATURE) / TEMPERATURE_RANGE)
+        if night:
+            factor *= NIGHT_GROWTH
+        growth = GROWTH_RATE * factor * b * (1 - b / CAPACITY) + SEED_RATE * factor
+
+        # Spread towards the mean of the four neighbours; edges reflect so nothing leaks out of the world
+        padded = np.pad(b, 1, mode="edge")
+        neighbours = (padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]) / 4
+        b += growth + SPREAD_RATE * (neighbours - b)
+        np.clip(b, 0, CAPACITY, out=b)
+
+    def cell(self, x: float, y: float):
+        return (min(self.rows - 1, max(0, int(y // self.cell_size))),
+                min(self.columns - 1, max(0, int(x // self.cell_size))))
+
+    def graze(self, x: float, y: float, bite: float) -> float:
+        row, column = self.cell(x, y)
+        eaten = min(bite, self.biomass[row, column])
+        self.biomass[row, column] -= eaten
+        return float(eaten)
+
+    def graze_many(self, x: np.ndarray, y: np.ndarray, bite: np.ndarray) -> np.ndarray:
+        # Grazers sharing a cell split what is there in proportion to their bites
+        rows = np.clip((y // self.cell_size).astype(np.int64), 0, self.rows - 1)
+        columns = np.clip((x // self.cell_size).astype(np.int64), 0, self.columns - 1)
+        cells = rows * self.columns + columns
+        flat = self.biomass.reshape(-1)
+        demand = np.bincount(cells, bite, minlength=flat.size)
+        share = np.ones_like(demand)
+        hungry = demand > flat
+        share[hungry] = flat[hungry] / demand[hungry]
+        eaten = bite * share[cells]
+        flat -= np.minimum(flat, demand)
+        return eaten
+
+    def total(self) -> float:
+        return float(self.biomass.sum())
@@ -0,0 +1,200 @@
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pygame
+
+from entities import Species
+from live import LiveView, SETTINGS, SPECIES
+from simulator import Simulator
+
+
+class RemoteVegetation:
+    # What the renderer and the stats panel read from a vegetation field
+    def __init__(self, biomass: np.ndarray, cell_size: float, total: float):
+        self.biomass = biomass
+        self.rows, self.columns = biomass.shape
+        self.cell_size = cell_size
+        self.biomass_total = total
+
+    def total(self) -> float:
+        return self.biomass_total
+
+
+class RemoteStats:
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.history: List[Dict] = []  # not published; the history panel stays empty
+
+    def count(self, species: Species) -> int:
+        return self.counts.get(species.name, 0)
+
+
+class RemoteEnvironment:
+    # Stands in for Environment inside the Simulator: reads come from the newest published frame and
+    # writes to the settings or spawns become commands to the running simulation
+    def __init__(self, view: LiveView):
+        self.view = view
+        self.stats = RemoteStats()
+        self.vegetation: Optional[RemoteVegetation] = None
+        self.profiler = None
+        self.current: Dict = {}
+        self.columns: Dict[str, np.ndarray] = {}
+        self.sent: Dict[str, object] = {}
+
+    def refresh(self) -> bool:
+        # The previous frame's views have to go before a remap can close the old block
+        self.columns, self.vegetation = {}, None
+        frame = self.view.read()
+        if frame is None:
+            return False
+        self.current, self.columns = frame
+        self.stats.counts = {species.name: self.current[species.name] for species in Species}
+        if self.current["rows"]:
+            self.vegetation = RemoteVegetation(self.columns["biomass"], self.current["cell_size"],
+                                               self.current["biomass"])
+        for name in SETTINGS:
+            self.sent.setdefault(name, self.current[name])
+        return True
+
+    def frame(self) -> Tuple[List[float], List[float], List[float], List[Species]]:
+        # The stats and biomass are used in place, but the entity columns are copied out here, once per drawn
+        # frame: the renderer's blit loop is plain Python, which walks lists several times faster than numpy
+        # scalars, and a copy taken right after the read is unlikely to be torn by the writer coming round again
+        c = self.columns
+        if not c:
+            return [], [], [], []
+        return c["x"].tolist(), c["y"].tolist(), c["size"].tolist(), SPECIES[c["species"] - 1].tolist()
+
+    def setting(self, name: str, value):
+        # Sliders are written every frame, so only changes go over the connection
+        if self.sent.get(name) != value:
+            self.sent[name] = value
+            self.view.send("set", name, value)
+
+    @property
+    def width(self) -> float:
+        return self.current.get("width", 0)
+
+    @property
+    def height(self) -> float:
+        return self.current.get("height", 0)
+
+    @property
+    def entities(self) -> range:
+        # Only ever counted
+        return range(self.current.get("count", 0))
+
+    @property
+    def temperature(self) -> float:
+        return self.current.get("temperature", 0.0)
+
+    @property
+    def night(self) -> bool:
+        return self.current.get("night", False)
+
+    @property
+    def paused(self) -> bool:
+        return self.sent.get("paused", False)
+
+    @paused.setter
+    def paused(self, value: bool):
+        self.setting("paused", value)
+
+    @property
+    def simulation_speed(self) -> float:
+        return self.sent.get("simulation_speed", 1.0)
+
+    @simulation_speed.setter
+    def simulation_speed(self, value: float):
+        self.setting("simulation_speed", value)
+
+    @property
+    def average_temperature(self) -> float:
+        return self.sent.get("average_temperature", 20.0)
+
+    @average_temperature.setter
+    def average_temperature(self, value: float):
+        self.setting("average_temperature", value)
+
+    @property
+    def mutation_rate(self) -> float:
+        return self.sent.get("mutation_rate", 0.1)
+
+    @mutation_rate.setter
+    def mutation_rate(self, value: float):
+        self.setting("mutation_rate", value)
+
+    def add_random_entity(self, species: Species):
+        self.view.send("spawn", species.name, 1)
+
+    def get_entity(self, entity_id: int):
+        return None  # entities are not published one by one
+
+
+class Viewer(Simulator):
+    # The Simulator's window on a simulation running in another process, e.g. `python run.py --live NAME`.
+    # Closing it leaves the simulation running; it can be attached to again at any time.
+    def __init__(self, width: int, height: int, name: str, timeout: float = 5.0):
+        super().__init__(width, height)
+        self.name = name
+        self.view = LiveView(name)
+        self.env = RemoteEnvironment(self.view)
+        # Frames are only published while a viewer is attached, so the first one follows the connection
+        deadline = time.monotonic() + timeout
+        while not self.env.refresh():
+            if not self.view.alive() or time.monotonic() > deadline:
+                self.view.close()
+                raise ValueError(f"No frames from {name}")
+            time.sleep(0.01)
+        self.sliders[0].value = self.env.simulation_speed
+        self.sliders[1].value = self.env.average_temperature
+        self.sliders[2].value = self.env.mutation_rate
+        self.ended = False
+        pygame.display.set_caption(f"Advanced Life Simulator - {name}")
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            self.view.close()
+
+    def update_simulation(self):
+        self.env.simulation_speed = self.sliders[0].value
+        self.env.average_temperature = self.sliders[1].value
+        self.env.mutation_rate = self.sliders[2].value
+        self.env.refresh()
+        if not self.ended and not self.view.alive():
+            self.ended = True
+            pygame.display.set_caption(f"Advanced Life Simulator - {self.name} (ended)")
+
+    def handle_key(self, key: int):
+        # Resets, vegetation and snapshots belong to the simulation's own process
+        if key in (pygame.K_F3, pygame.K_F4):
+            super().handle_key(key)
+
+    def tick_rates(self) -> Tuple[float, float]:
+        current = self.env.current
+        return current["rate"], current["target_rate"] or current["rate"]
+
+    def pick_entity(self, pos: Tuple[int, int]):
+        pass
+
+    def reset(self):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch and steer a simulation started with run.py --live")
+    parser.add_argument("name", help="the name given to --live")
+    args = parser.parse_args(argv)
+    try:
+        viewer = Viewer(1100, 600, args.name)
+    except (FileNotFoundError, ValueError, ConnectionError) as error:
+        parser.exit(1, f"Cannot attach to {args.name}: {error}\n")
+    viewer.run()
+
+
+if __name__ == "__main__":
+    main()